@@ -3,28 +3,27 @@
 from __future__ import annotations
 
 import logging
-import shutil
-import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime, timedelta
 
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
-from plotly.subplots import make_subplots
 from pydantic import ValidationError
 
-from dip_catcher.config import PRESET_ITEMS, load_config, save_config
+from dip_catcher.config import CONFIG_PATH, PRESET_ITEMS, load_config, save_config
 from dip_catcher.market import render_market_overview
 from dip_catcher.logic import (
     AnalysisResult,
+    SignalLabel,
     analyze,
-    calc_bollinger_bands,
-    calc_cumulative_returns,
-    calc_daily_returns,
-    calc_drawdown,
-    calc_ma_deviation,
-    calc_recent_peak,
-    calc_rsi,
+    bollinger_values,
+    drawdown_values,
+    lttb_indices,
+    pct_change_values,
+    rolling_mean_values,
+    rsi_values,
 )
 from dip_catcher.models import (
     AnalysisConfig,
@@ -38,49 +37,22 @@ from dip_catcher.sources import get_source
 logger = logging.getLogger(__name__)
 
 
-_playwright_checked = False
+@st.cache_data(show_spinner=False, max_entries=1)
+def _load_config_cached(mtime_ns: int) -> AppConfig:
+    """設定ファイルを読み込む。更新時刻をキーにし、保存されるまで再パースしない。
 
-
-def _ensure_playwright_browser() -> None:
-    """Playwright で使える Chromium を確保する。
-
-    1. システム Chromium（apt 等でインストール済み）があればそれを使う
-    2. なければ Playwright バンドル版を試す
-    3. それもなければ playwright install を実行する
+    cache_data は呼び出しごとに複製を返すため、呼び出し側で変更しても共有されない。
     """
-    global _playwright_checked
-    if _playwright_checked:
-        return
+    return load_config()
 
-    # システム Chromium があれば OK（Streamlit Cloud では packages.txt 経由）
-    for name in ("chromium", "chromium-browser", "google-chrome"):
-        if shutil.which(name):
-            logger.info("System Chromium found: %s", name)
-            _playwright_checked = True
-            return
 
-    # Playwright バンドル版を試す
+def _load_config() -> AppConfig:
     try:
-        from playwright.sync_api import sync_playwright
-        with sync_playwright() as pw:
-            pw.chromium.launch(headless=True).close()
-        _playwright_checked = True
-        return
-    except Exception:
-        pass
+        mtime_ns = CONFIG_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime_ns = 0
+    return _load_config_cached(mtime_ns)
 
-    # バンドル版がなければインストールを試みる
-    logger.info("Installing Playwright Chromium browser...")
-    try:
-        subprocess.run(
-            ["playwright", "install", "chromium"],
-            check=True,
-            capture_output=True,
-            timeout=300,
-        )
-    except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired) as e:
-        logger.error("Failed to install Playwright Chromium: %s", e)
-    _playwright_checked = True
 
 _CATEGORY_LABELS = {
     AssetCategory.US_STOCK: "米国株・ETF",
@@ -89,16 +61,29 @@ _CATEGORY_LABELS = {
     AssetCategory.INDEX: "主要指数",
 }
 
+_CURRENCY_SYMBOLS = {
+    AssetCategory.US_STOCK: "$",
+    AssetCategory.JP_STOCK: "¥",
+    AssetCategory.JP_FUND: "¥",
+    AssetCategory.INDEX: "",
+}
+
 _LABEL_COLORS = {
-    "強い買い場": "#dc2626",
-    "買い場検討": "#ea580c",
-    "様子見": "#ca8a04",
-    "待機": "#6b7280",
+    SignalLabel.STRONG_BUY: "#dc2626",
+    SignalLabel.CONSIDER: "#ea580c",
+    SignalLabel.NEUTRAL: "#ca8a04",
+    SignalLabel.WAIT: "#6b7280",
 }
 
+assert set(_LABEL_COLORS) == set(SignalLabel), "Every SignalLabel needs a color"
+
+# 価格データの内容ハッシュ (data_key) をキーにするキャッシュの設定。
+# データが変われば別キーになるため TTL は長めにし、件数で上限を設ける。
+# go.Figure は構築後に変更しないため cache_resource で共有し、ヒット時の複製を省く。
+_DATA_CACHE = dict(ttl=3600, max_entries=64, show_spinner=False)
+
 
 def main() -> None:
-    _ensure_playwright_browser()
     st.set_page_config(page_title="Dip Catcher", page_icon="📉", layout="wide")
     st.markdown(
         "<style>"
@@ -112,7 +97,7 @@ def main() -> None:
         key="radio_view",
     )
 
-    config = load_config()
+    config = _load_config()
 
     if view == "市場概況":
         render_market_overview(config)
@@ -129,18 +114,20 @@ def main() -> None:
     if selected is None:
         return
 
+    _prefetch_watchlist(config, st.session_state["radio_watchlist"])
     history, last_modified, is_fallback = _load_and_display(selected, config.analysis)
     if history is None:
         return
 
-    result = analyze(history, config.analysis)
-    closes = history.df["close"].reset_index(drop=True)
-    dates = history.df["date"].reset_index(drop=True)
+    data_key = history.content_hash
+    result = _analyze_cached(data_key, config.analysis, history)
+    closes = history.closes32
+    dates = history.iso_dates
 
     _render_update_status(last_modified, is_fallback)
     _render_summary(selected, history, result)
-    _render_main_chart(dates, closes, config.analysis)
-    _render_analysis_panel(dates, closes, result, config.analysis, config.watchlist)
+    _render_main_chart(data_key, dates, closes, config.analysis)
+    _render_analysis_panel(data_key, dates, closes, result, config.analysis, config.watchlist)
 
 
 # ---------------------------------------------------------------------------
@@ -182,6 +169,7 @@ def _render_sidebar(config: AppConfig) -> tuple[AppConfig, WatchlistItem | None]
     return config, selected
 
 
+@st.fragment
 def _render_add_form(config: AppConfig) -> None:
     with st.form("add_item", clear_on_submit=True):
         col1, col2 = st.columns(2)
@@ -213,23 +201,32 @@ def _render_add_form(config: AppConfig) -> None:
             st.rerun()
 
 
+@st.fragment
 def _render_preset_picker(config: AppConfig) -> None:
     existing_codes = {w.code for w in config.watchlist}
-    for category, items in PRESET_ITEMS.items():
-        st.caption(_CATEGORY_LABELS[category])
-        for item in items:
-            col_name, col_btn = st.columns([4, 1])
-            with col_name:
-                st.markdown(f"<small>{item.name}</small>", unsafe_allow_html=True)
-            with col_btn:
-                if item.code in existing_codes:
-                    st.button("✓", key=f"preset_{item.code}", disabled=True)
-                elif st.button("＋", key=f"preset_{item.code}"):
-                    config.watchlist.append(item)
-                    save_config(config)
-                    st.session_state["_pending_idx"] = len(config.watchlist) - 1
-                    st.session_state["_expand_add"] = True
-                    st.rerun()
+    available = [
+        item for items in PRESET_ITEMS.values() for item in items
+        if item.code not in existing_codes
+    ]
+    if not available:
+        st.caption("すべてのプリセットを追加済みです。")
+        return
+
+    picked = st.multiselect(
+        "プリセット",
+        options=available,
+        format_func=lambda item: f"{item.name}（{_CATEGORY_LABELS[item.category]}）",
+        placeholder="追加する銘柄を選択",
+        label_visibility="collapsed",
+        # 追加後は別キーにして、選択済みの項目を新しい候補に持ち越さない
+        key=f"preset_pick_{'|'.join(sorted(existing_codes))}",
+    )
+    if picked:
+        config.watchlist.extend(picked)
+        save_config(config)
+        st.session_state["_pending_idx"] = len(config.watchlist) - 1
+        st.session_state["_expand_add"] = True
+        st.rerun()
 
 
 def _render_watchlist(config: AppConfig) -> WatchlistItem | None:
@@ -239,35 +236,59 @@ def _render_watchlist(config: AppConfig) -> WatchlistItem | None:
 
     items = config.watchlist
     _init_selection(len(items))
-    selected_idx = st.session_state.get("radio_watchlist", 0)
-
-    for i, item in enumerate(items):
-        col_btn, col_del = st.columns([5, 1])
-        with col_btn:
-            btn_type = "primary" if i == selected_idx else "secondary"
-            if st.button(
-                f"{item.name} ({item.code})",
-                key=f"wl_select_{i}",
-                type=btn_type,
-                use_container_width=True,
-            ):
-                st.session_state["_pending_idx"] = i
-                st.session_state.pop("_expand_add", None)
-                st.rerun()
-        with col_del:
-            if st.button("🗑", key=f"wl_del_{i}"):
-                config.watchlist.pop(i)
-                save_config(config)
-                new_count = len(config.watchlist)
-                if new_count > 0:
-                    st.session_state["_pending_idx"] = min(selected_idx, new_count - 1)
-                else:
-                    st.session_state.pop("radio_watchlist", None)
-                st.rerun()
+    selected_idx = st.radio(
+        "銘柄",
+        options=range(len(items)),
+        format_func=lambda i: f"{items[i].name} ({items[i].code})",
+        key="radio_watchlist",
+        label_visibility="collapsed",
+        on_change=lambda: st.session_state.pop("_expand_add", None),
+    )
 
+    _render_watchlist_editor(config, selected_idx)
     return items[selected_idx]
 
 
+@st.fragment
+def _render_watchlist_editor(config: AppConfig, selected_idx: int) -> None:
+    """削除チェックを 1 つの表でまとめて受け付け、変更があれば一度だけ保存する。"""
+    items = config.watchlist
+    codes = [item.code for item in items]
+    with st.expander("監視リストを編集"):
+        edited = st.data_editor(
+            pd.DataFrame({
+                "name": [item.name for item in items],
+                "code": codes,
+                "delete": [False] * len(items),
+            }),
+            hide_index=True,
+            use_container_width=True,
+            disabled=["name", "code"],
+            column_config={
+                "name": "表示名",
+                "code": "銘柄コード",
+                "delete": st.column_config.CheckboxColumn("削除"),
+            },
+            # 削除後は別キーにして、前回のチェック状態を新しい行に持ち越さない
+            key=f"wl_editor_{'|'.join(codes)}",
+        )
+    delete = edited["delete"].to_numpy(dtype=bool)
+    if not delete.any():
+        return
+
+    selected_code = codes[selected_idx]
+    config.watchlist = [item for item, d in zip(items, delete) if not d]
+    save_config(config)
+    remaining = [item.code for item in config.watchlist]
+    if selected_code in remaining:
+        st.session_state["_pending_idx"] = remaining.index(selected_code)
+    elif remaining:
+        st.session_state["_pending_idx"] = min(selected_idx, len(remaining) - 1)
+    else:
+        st.session_state.pop("radio_watchlist", None)
+    st.rerun()
+
+
 def _render_analysis_settings(config: AppConfig) -> AppConfig:
     a = config.analysis
 
@@ -279,15 +300,14 @@ def _render_analysis_settings(config: AppConfig) -> AppConfig:
     )
     ma_days = st.slider("移動平均 (日)", 5, 200, a.ma_days)
 
-    new_analysis = AnalysisConfig(
-        period_years=period,
-        ma_days=ma_days,
-        rsi_period=a.rsi_period,
-        bb_period=a.bb_period,
-        bb_std=a.bb_std,
-    )
-    if new_analysis != config.analysis:
-        config.analysis = new_analysis
+    if (period, ma_days) != (a.period_years, a.ma_days):
+        config.analysis = AnalysisConfig(
+            period_years=period,
+            ma_days=ma_days,
+            rsi_period=a.rsi_period,
+            bb_period=a.bb_period,
+            bb_std=a.bb_std,
+        )
         save_config(config)
 
     return config
@@ -304,7 +324,7 @@ def _load_and_display(
     """キャッシュ優先でデータを取得する。
 
     1. ディスクキャッシュがあれば即座に返す（ネットワーク不要）
-    2. キャッシュが古ければバックグラウンドで更新する
+    2. キャッシュが古ければバックグラウンドで更新する（反映は次回の再実行時）
     3. キャッシュがなければ同期的に取得する
 
     Returns:
@@ -314,16 +334,20 @@ def _load_and_display(
     end = date.today()
     start = end - timedelta(days=365 * analysis.period_years)
 
-    # Step 1: ディスクキャッシュを即座に読み込む
-    cached = source.load_cache(item.code, start, end)
+    # Step 1: ディスクキャッシュを即座に読み込む（ファイルが変わるまでは読み直さない）
+    version = source.cache_version(item.code)
+    cached = None
+    if version is not None:
+        cached = _load_cached_history(item.code, item.category.value, start, end, version)
 
     if cached is not None:
         # キャッシュがあれば即座に返す（期間不足はバックグラウンドで補完）
-        cache_start = cached.df["date"].min().date()
+        history, last_modified = cached
+        cache_start = pd.Timestamp(history.dates[0]).date()
         missing_days = (cache_start - start).days
         if source.needs_refresh(item.code) or missing_days > 30:
             _background_refresh(item.code, item.category.value, start, end)
-        return PriceHistory(cached.df), cached.last_modified, cached.is_fallback
+        return history, last_modified, False
 
     # Step 3: キャッシュなし → 初回は同期取得
     with st.spinner("初回データ取得中…"):
@@ -336,22 +360,74 @@ def _load_and_display(
             return None, None, False
 
 
+@st.cache_resource(**_DATA_CACHE)
+def _load_cached_history(
+    code: str, category: str, start: date, end: date, version: tuple[int, int, int],
+) -> tuple[PriceHistory, datetime | None] | None:
+    """ディスクキャッシュから作った PriceHistory を共有する。
+
+    キャッシュファイルの版 (mtime_ns, サイズ, inode) をキーにするため、ファイルが更新されるまでは
+    Parquet の読み込みも content_hash 等の再計算も行わない。PriceHistory は読み取り専用で扱う。
+    """
+    cached = get_source(AssetCategory(category)).load_cache(code, start, end)
+    if cached is None:
+        return None
+    return PriceHistory(cached.df), cached.last_modified
+
+
+@st.cache_resource(show_spinner=False)
+def _refresh_pool() -> ThreadPoolExecutor:
+    """キャッシュ更新用のスレッドプール。プロセス内の全セッションで共有する。"""
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="cache-refresh")
+
+
 @st.cache_data(ttl=10800, show_spinner=False)
 def _background_refresh(
     code: str, category: str, start: date, end: date,
 ) -> bool:
-    """キャッシュをバックグラウンドで更新する。
+    """キャッシュ更新をスレッドプールに投入し、完了を待たずに戻る。
 
-    st.cache_data (TTL=3時間) で同一引数の再実行を抑止する。
+    st.cache_data (TTL=3時間) で同一引数の再投入を抑止する。同じ銘柄の取得は
+    CachedSource.fetch が直列化するため、期間だけ異なる呼び出しや初回の同期取得と
+    重なっても、後の取得は先の結果への差分取得になる。
     """
-    cat = AssetCategory(category)
-    source = get_source(cat)
+    _refresh_pool().submit(_refresh_item, code, AssetCategory(category), start, end)
+    return True
+
+
+def _refresh_item(code: str, category: AssetCategory, start: date, end: date) -> None:
     try:
-        source.fetch(code, start, end)
-        return True
+        get_source(category).fetch(code, start, end)
     except (ValueError, ConnectionError, OSError, TimeoutError) as e:
         logger.warning("Background refresh failed for %s: %s", code, e)
-        return False
+
+
+def _prefetch_watchlist(config: AppConfig, selected_idx: int) -> None:
+    """監視リスト全銘柄のうち古いキャッシュの更新を、セッションにつき 1 回投入する。
+
+    次に選ばれやすい、選択中の銘柄に近い順に投入する。
+    """
+    if st.session_state.get("_prefetched"):
+        return
+    st.session_state["_prefetched"] = True
+
+    end = date.today()
+    start = end - timedelta(days=365 * config.analysis.period_years)
+    order = sorted(range(len(config.watchlist)), key=lambda i: abs(i - selected_idx))
+    for item in (config.watchlist[i] for i in order):
+        if get_source(item.category).needs_refresh(item.code):
+            _background_refresh(item.code, item.category.value, start, end)
+
+
+@st.cache_data(**_DATA_CACHE)
+def _analyze_cached(
+    data_key: str, analysis: AnalysisConfig, _history: PriceHistory,
+) -> AnalysisResult:
+    """analyze() の結果をキャッシュする。
+
+    PriceHistory 自体はハッシュせず、data_key（価格データのダイジェスト）と分析設定をキーにする。
+    """
+    return analyze(_history, analysis)
 
 
 def _render_update_status(last_modified: datetime | None, is_fallback: bool) -> None:
@@ -373,21 +449,9 @@ def _render_update_status(last_modified: datetime | None, is_fallback: bool) ->
 # ---------------------------------------------------------------------------
 
 
-def _currency_symbol(category: AssetCategory) -> str:
-    if category == AssetCategory.US_STOCK:
-        return "$"
-    if category == AssetCategory.INDEX:
-        return ""
-    return "¥"
-
-
 def _render_summary(item: WatchlistItem, history: PriceHistory, result: AnalysisResult) -> None:
-    label_color = _LABEL_COLORS.get(result.label, "#6b7280")
-    sym = _currency_symbol(item.category)
-
-    closes = history.df["close"]
-    recent_high = calc_recent_peak(closes)
-    recent_dd = (history.latest_close - recent_high) / recent_high if recent_high > 0 else 0.0
+    label_color = _LABEL_COLORS[result.label]
+    sym = _CURRENCY_SYMBOLS[item.category]
 
     col1, col2, col3, col4, col5, col6 = st.columns(6)
     with col1:
@@ -396,7 +460,7 @@ def _render_summary(item: WatchlistItem, history: PriceHistory, result: Analysis
         daily_ret_pct = result.current_daily_return * 100
         st.metric("前日比", f"{daily_ret_pct:+.2f}%")
     with col3:
-        recent_dd_pct = recent_dd * 100
+        recent_dd_pct = result.recent_drawdown * 100
         st.metric("直近高値からの下落率", f"{recent_dd_pct:+.1f}%")
     with col4:
         dd_pct = result.current_drawdown * 100
@@ -408,7 +472,7 @@ def _render_summary(item: WatchlistItem, history: PriceHistory, result: Analysis
             f"<div style='text-align:center;padding:0.5rem;'>"
             f"<span style='font-size:0.8rem;color:#888;'>判定</span><br>"
             f"<span style='font-size:1.5rem;font-weight:bold;color:{label_color};'>"
-            f"{result.label}</span></div>",
+            f"{result.label.value}</span></div>",
             unsafe_allow_html=True,
         )
 
@@ -417,25 +481,57 @@ def _render_summary(item: WatchlistItem, history: PriceHistory, result: Analysis
 # メインチャート
 # ---------------------------------------------------------------------------
 
+# 1 トレースあたりの最大描画点数（超える分は LTTB で間引く）
+_CHART_MAX_POINTS = 800
 
-def _render_main_chart(dates: pd.Series, closes: pd.Series, config: AnalysisConfig) -> None:
-    st.subheader("価格チャート")
+# 各チャートで共通のレイアウト指定
+_CHART_MARGIN = dict(l=0, r=0, t=30, b=0)
+_RSI_MARGIN = dict(l=0, r=0, t=10, b=0)
+_MAIN_LEGEND = dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+_RSI_YAXIS = dict(range=[0, 100], title="相対力指数（RSI）")
+_DATE_TICKS = dict(type="date", tickformat="%Y/%m", dtick="M3")
+_PLOTLY_CONFIG = {"displayModeBar": False}
 
-    fig = make_subplots(
-        rows=2, cols=1, shared_xaxes=True,
-        vertical_spacing=0.03,
-        row_heights=[0.7, 0.3],
-        subplot_titles=("", "ドローダウン (%)"),
+
+def _render_main_chart(
+    data_key: str, dates: np.ndarray, closes: np.ndarray, config: AnalysisConfig,
+) -> None:
+    st.subheader("価格チャート")
+    st.plotly_chart(
+        _build_price_figure(data_key, config, dates, closes),
+        use_container_width=True, config=_PLOTLY_CONFIG,
     )
+    st.plotly_chart(
+        _build_drawdown_figure(data_key, dates, closes),
+        use_container_width=True, config=_PLOTLY_CONFIG,
+    )
+
+
+@st.cache_data(**_DATA_CACHE)
+def _chart_indices(data_key: str, _closes: np.ndarray) -> np.ndarray:
+    """価格チャートとドローダウンチャートで共通の LTTB 間引きインデックス。"""
+    return lttb_indices(_closes, _CHART_MAX_POINTS)
+
+
+@st.cache_resource(**_DATA_CACHE)
+def _build_price_figure(
+    data_key: str, config: AnalysisConfig, _dates: np.ndarray, _closes: np.ndarray,
+) -> go.Figure:
+    """価格・移動平均・ボリンジャーバンドのチャートを構築する。
+
+    指標は全期間で計算し、描画する点だけを LTTB で _CHART_MAX_POINTS 点に間引く。
+    """
+    idx = _chart_indices(data_key, _closes)
+    dates = _dates[idx]
+    fig = go.Figure()
 
     # 価格ライン
     fig.add_trace(
-        go.Scatter(
-            x=dates, y=closes, name="価格",
+        go.Scattergl(
+            x=dates, y=_closes[idx], name="価格",
             line=dict(color="#2563eb", width=1.5),
             hovertemplate="%{x|%Y年%m月%d日}<br>価格: %{y:,.0f}<extra></extra>",
-        ),
-        row=1, col=1,
+        )
     )
 
     # 移動平均
@@ -443,59 +539,58 @@ def _render_main_chart(dates: pd.Series, closes: pd.Series, config: AnalysisConf
     if config.ma_days != 25:
         _ma_lines.append((config.ma_days, "#f59e0b", "dash"))
     for window, color, dash in _ma_lines:
-        ma = closes.rolling(window=window, min_periods=window).mean()
+        ma = rolling_mean_values(_closes, window)[idx]
         fig.add_trace(
-            go.Scatter(
+            go.Scattergl(
                 x=dates, y=ma, name=f"{window}日平均",
                 line=dict(color=color, width=1, dash=dash),
                 hovertemplate="%{y:,.0f}<extra></extra>",
-            ),
-            row=1, col=1,
+            )
         )
 
-    # ボリンジャーバンド
-    bb = calc_bollinger_bands(closes, config.bb_period, config.bb_std)
+    # ボリンジャーバンド（上限→下限を折り返した 1 本の多角形で帯を塗る）
+    _, bb_upper, bb_lower, _ = bollinger_values(_closes, config.bb_period, config.bb_std)
+    bb_upper, bb_lower = bb_upper[idx], bb_lower[idx]
+    valid = ~np.isnan(bb_upper)
+    band_dates = dates[valid]
     fig.add_trace(
-        go.Scatter(
-            x=dates, y=bb.upper, name=f"ボリンジャー上限",
-            line=dict(color="#94a3b8", width=0.5), showlegend=False,
-            hoverinfo="skip",
-        ),
-        row=1, col=1,
-    )
-    fig.add_trace(
-        go.Scatter(
-            x=dates, y=bb.lower, name=f"ボリンジャー下限",
+        go.Scattergl(
+            x=np.concatenate([band_dates, band_dates[::-1]]),
+            y=np.concatenate([bb_upper[valid], bb_lower[valid][::-1]]),
+            name="ボリンジャーバンド",
             line=dict(color="#94a3b8", width=0.5),
-            fill="tonexty", fillcolor="rgba(148,163,184,0.1)", showlegend=False,
+            fill="toself", fillcolor="rgba(148,163,184,0.1)", showlegend=False,
             hoverinfo="skip",
-        ),
-        row=1, col=1,
+        )
+    )
+
+    fig.update_layout(
+        height=350, margin=_CHART_MARGIN, legend=_MAIN_LEGEND, hovermode="x",
+        yaxis_title="価格",
     )
+    fig.update_xaxes(**_DATE_TICKS)
+    return fig
 
-    # ドローダウン（面グラフ）
-    dd = calc_drawdown(closes) * 100
+
+@st.cache_resource(**_DATA_CACHE)
+def _build_drawdown_figure(data_key: str, _dates: np.ndarray, _closes: np.ndarray) -> go.Figure:
+    """ドローダウンの面グラフを構築する。分析設定に依存しないため価格データだけで決まる。"""
+    idx = _chart_indices(data_key, _closes)
+    dd = drawdown_values(_closes)[idx] * 100
+    fig = go.Figure()
     fig.add_trace(
-        go.Scatter(
-            x=dates, y=dd, name="ドローダウン", fill="tozeroy",
+        go.Scattergl(
+            x=_dates[idx], y=dd, name="ドローダウン", fill="tozeroy",
             line=dict(color="#dc2626", width=1), fillcolor="rgba(220,38,38,0.2)",
             hovertemplate="%{x|%Y年%m月%d日}<br>下落率: %{y:.1f}%<extra></extra>",
-        ),
-        row=2, col=1,
+        )
     )
-
-    _dtick = dict(tickformat="%Y/%m", dtick="M3")
     fig.update_layout(
-        height=500, margin=dict(l=0, r=0, t=30, b=0),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-        hovermode="x",
+        height=170, margin=_CHART_MARGIN, hovermode="x", showlegend=False,
+        title=dict(text="ドローダウン (%)", font_size=13), yaxis_title="下落率 (%)",
     )
-    fig.update_xaxes(**_dtick, row=1, col=1)
-    fig.update_xaxes(**_dtick, row=2, col=1)
-    fig.update_yaxes(title_text="価格", row=1, col=1)
-    fig.update_yaxes(title_text="下落率 (%)", row=2, col=1)
-
-    st.plotly_chart(fig, use_container_width=True)
+    fig.update_xaxes(**_DATE_TICKS)
+    return fig
 
 
 # ---------------------------------------------------------------------------
@@ -503,32 +598,39 @@ def _render_main_chart(dates: pd.Series, closes: pd.Series, config: AnalysisConf
 # ---------------------------------------------------------------------------
 
 
+_ANALYSIS_PANELS = ("スコア内訳", "騰落スコア", "RSI", "過去ドローダウン", "月次騰落率")
+
+
+@st.fragment
 def _render_analysis_panel(
-    dates: pd.Series,
-    closes: pd.Series,
+    data_key: str,
+    dates: np.ndarray,
+    closes: np.ndarray,
     result: AnalysisResult,
     config: AnalysisConfig,
     watchlist: list[WatchlistItem],
 ) -> None:
+    """選択中の分析パネルを描画する。
+
+    fragment なので、パネル切り替えではデータ取得・分析・メインチャートを再実行しない。
+    """
     st.subheader("分析パネル")
 
-    tab_scores, tab_histogram, tab_rsi, tab_events, tab_monthly = st.tabs(
-        ["スコア内訳", "騰落スコア", "RSI", "過去ドローダウン", "月次騰落率"]
+    # st.tabs は全タブの中身を毎回計算するため、選択中のパネルだけを描画する
+    active = st.radio(
+        "分析パネル", _ANALYSIS_PANELS, horizontal=True,
+        key="analysis_panel", label_visibility="collapsed",
     )
 
-    with tab_scores:
+    if active == "スコア内訳":
         _render_score_breakdown(result)
-
-    with tab_histogram:
-        _render_return_histogram(closes, result)
-
-    with tab_rsi:
-        _render_rsi_chart(dates, closes, config)
-
-    with tab_events:
+    elif active == "騰落スコア":
+        _render_return_histogram(data_key, closes, result)
+    elif active == "RSI":
+        _render_rsi_chart(data_key, dates, closes, config)
+    elif active == "過去ドローダウン":
         _render_dd_events(result)
-
-    with tab_monthly:
+    else:
         _render_monthly_table(watchlist, config)
 
 
@@ -542,42 +644,65 @@ def _render_score_breakdown(result: AnalysisResult) -> None:
         ("バンドからの逸脱", scores.bollinger, 10, f"位置 {result.current_bb_percent_b:.2f}"),
     ]
 
-    for name, score, weight, value in items:
-        col1, col2, col3 = st.columns([3, 5, 2])
-        with col1:
-            st.text(f"{name} (×{weight}%)")
-        with col2:
-            st.progress(min(score / 100, 1.0))
-        with col3:
-            st.text(f"{score:.0f}点  {value}")
+    # 5 行分を 1 つの HTML グリッドにまとめて描画する
+    rows = "".join(
+        f"<div>{name} (×{weight}%)</div>"
+        f"<div style='background:#e5e7eb;border-radius:0.25rem;height:0.5rem;'>"
+        f"<div style='width:{min(score, 100):.0f}%;background:#2563eb;"
+        f"border-radius:0.25rem;height:0.5rem;'></div></div>"
+        f"<div>{score:.0f}点&nbsp;&nbsp;{value}</div>"
+        for name, score, weight, value in items
+    )
+    st.markdown(
+        "<div style='display:grid;grid-template-columns:3fr 5fr 2fr;"
+        f"gap:0.5rem 1rem;align-items:center;font-size:0.9rem;'>{rows}</div>",
+        unsafe_allow_html=True,
+    )
 
     st.divider()
-    label_color = _LABEL_COLORS.get(result.label, "#6b7280")
+    label_color = _LABEL_COLORS[result.label]
     st.markdown(
         f"**総合スコア: {result.total_score:.0f} / 100** → "
-        f"<span style='color:{label_color};font-weight:bold;'>{result.label}</span>",
+        f"<span style='color:{label_color};font-weight:bold;'>{result.label.value}</span>",
         unsafe_allow_html=True,
     )
 
 
-def _render_return_histogram(closes: pd.Series, result: AnalysisResult) -> None:
+def _render_return_histogram(data_key: str, closes: np.ndarray, result: AnalysisResult) -> None:
     w = result.rarity_window
-    if w > 1:
-        returns = calc_cumulative_returns(closes, w) * 100
-    else:
-        returns = calc_daily_returns(closes) * 100
     window_label = f"{w}日間" if w > 1 else "日次"
+    st.plotly_chart(
+        _build_return_histogram(data_key, w, result.rarity_return, closes),
+        use_container_width=True, config=_PLOTLY_CONFIG,
+    )
+    st.caption(
+        f"直近{window_label}の騰落率は過去の分布の中で **下位 {result.return_percentile:.1f}%** の位置にあります。"
+        f"1日/3日/5日の中で最もレアなウィンドウを自動選択しています。"
+    )
 
+
+@st.cache_resource(**_DATA_CACHE)
+def _build_return_histogram(
+    data_key: str, window: int, rarity_return: float, _closes: np.ndarray,
+) -> go.Figure:
+    """window 日間騰落率の分布と直近値のヒストグラムを構築する。"""
+    returns = pct_change_values(_closes, window)
+    returns = returns[~np.isnan(returns)] * 100
+    window_label = f"{window}日間" if window > 1 else "日次"
+
+    # 集計はサーバー側で行い、ブラウザには 50 本分の棒だけを送る
+    counts, edges = np.histogram(returns, bins=50)
     fig = go.Figure()
     fig.add_trace(
-        go.Histogram(
-            x=returns, nbinsx=50, name="騰落率",
+        go.Bar(
+            x=((edges[:-1] + edges[1:]) / 2).astype(np.float32), y=counts,
+            width=float(edges[1] - edges[0]), name="騰落率",
             marker_color="#2563eb", opacity=0.7,
             hovertemplate="騰落率: %{x:.2f}%<br>回数: %{y}<extra></extra>",
         )
     )
 
-    current_ret = result.rarity_return * 100
+    current_ret = rarity_return * 100
     fig.add_vline(
         x=current_ret, line_dash="dash", line_color="#dc2626", line_width=2,
         annotation_text=f"直近{window_label}騰落率 {current_ret:.2f}%",
@@ -586,23 +711,34 @@ def _render_return_histogram(closes: pd.Series, result: AnalysisResult) -> None:
 
     fig.update_layout(
         xaxis_title=f"{window_label}騰落率 (%)", yaxis_title="発生回数",
-        height=350, margin=dict(l=0, r=0, t=30, b=0),
+        height=350, margin=_CHART_MARGIN,
         showlegend=False,
     )
-    st.plotly_chart(fig, use_container_width=True)
-    st.caption(
-        f"直近{window_label}の騰落率は過去の分布の中で **下位 {result.return_percentile:.1f}%** の位置にあります。"
-        f"1日/3日/5日の中で最もレアなウィンドウを自動選択しています。"
+    return fig
+
+
+def _render_rsi_chart(
+    data_key: str, dates: np.ndarray, closes: np.ndarray, config: AnalysisConfig,
+) -> None:
+    st.plotly_chart(
+        _build_rsi_figure(data_key, config.rsi_period, dates, closes),
+        use_container_width=True, config=_PLOTLY_CONFIG,
     )
+    st.caption("RSI（相対力指数）は、直近の値動きが上昇・下落どちらに傾いているかを示します。30以下は「売られすぎ」で反発の可能性を示唆します。")
 
 
-def _render_rsi_chart(dates: pd.Series, closes: pd.Series, config: AnalysisConfig) -> None:
-    rsi = calc_rsi(closes, config.rsi_period)
+@st.cache_resource(**_DATA_CACHE)
+def _build_rsi_figure(
+    data_key: str, rsi_period: int, _dates: np.ndarray, _closes: np.ndarray,
+) -> go.Figure:
+    """RSI チャートを構築する。値のある区間だけを LTTB で間引いて描画する。"""
+    rsi = rsi_values(_closes, rsi_period)
+    idx = lttb_indices(rsi, _CHART_MAX_POINTS)
 
     fig = go.Figure()
     fig.add_trace(
-        go.Scatter(
-            x=dates, y=rsi, name=f"RSI（{config.rsi_period}日）",
+        go.Scattergl(
+            x=_dates[idx], y=rsi[idx], name=f"RSI（{rsi_period}日）",
             line=dict(color="#7c3aed", width=1.5),
             hovertemplate="%{x|%Y年%m月%d日}<br>RSI: %{y:.1f}<extra></extra>",
         )
@@ -612,13 +748,10 @@ def _render_rsi_chart(dates: pd.Series, closes: pd.Series, config: AnalysisConfi
     fig.add_hrect(y0=30, y1=70, fillcolor="rgba(0,0,0,0.03)", line_width=0)
 
     fig.update_layout(
-        yaxis=dict(range=[0, 100], title="相対力指数（RSI）"),
-        height=300, margin=dict(l=0, r=0, t=10, b=0),
-        showlegend=False,
+        yaxis=_RSI_YAXIS, height=300, margin=_RSI_MARGIN, showlegend=False,
     )
-    fig.update_xaxes(tickformat="%Y/%m", dtick="M3")
-    st.plotly_chart(fig, use_container_width=True)
-    st.caption("RSI（相対力指数）は、直近の値動きが上昇・下落どちらに傾いているかを示します。30以下は「売られすぎ」で反発の可能性を示唆します。")
+    fig.update_xaxes(**_DATE_TICKS)
+    return fig
 
 
 def _render_dd_events(result: AnalysisResult) -> None:
@@ -627,53 +760,52 @@ def _render_dd_events(result: AnalysisResult) -> None:
         st.info("分析期間中に有意なドローダウンイベントはありません。")
         return
 
-    rows = []
-    for e in events:
-        rows.append({
-            "ピーク日": e.peak_date.strftime("%Y-%m-%d"),
-            "底値日": e.trough_date.strftime("%Y-%m-%d"),
-            "最大下落率": f"{e.max_drawdown*100:.1f}%",
-            "回復日": e.recovery_date.strftime("%Y-%m-%d") if e.recovery_date else "未回復",
-            "回復日数": f"{e.recovery_days}日" if e.recovery_days is not None else "-",
-        })
+    # 列ごとに配列へまとめ、日付・数値の書式化は配列演算で一括して行う
+    recovery_dates = pd.DatetimeIndex([e.recovery_date for e in events])
+    recovery_days = np.array([e.recovery_days or 0 for e in events])
+    df = pd.DataFrame({
+        "ピーク日": pd.DatetimeIndex([e.peak_date for e in events]).strftime("%Y-%m-%d"),
+        "底値日": pd.DatetimeIndex([e.trough_date for e in events]).strftime("%Y-%m-%d"),
+        "最大下落率": np.char.mod("%.1f%%", np.array([e.max_drawdown for e in events]) * 100),
+        "回復日": np.where(recovery_dates.isna(), "未回復", recovery_dates.strftime("%Y-%m-%d")),
+        "回復日数": np.where(recovery_dates.isna(), "-", np.char.mod("%d日", recovery_days)),
+    })
 
-    st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+    st.dataframe(df, use_container_width=True, hide_index=True)
 
 
 def _render_monthly_table(watchlist: list[WatchlistItem], config: AnalysisConfig) -> None:
     end = date.today()
     start = end - timedelta(days=365 * config.period_years)
 
-    series: dict[str, pd.Series] = {}
-    for item in watchlist:
-        source = get_source(item.category)
-        cached = source.load_cache(item.code, start, end)
-        if cached is None:
-            continue
-        df = cached.df.copy()
-        df["month"] = df["date"].dt.to_period("M")
-        monthly_close = df.groupby("month")["close"].last()
-        series[item.name] = monthly_close.pct_change()
-
-    if not series:
+    # キャッシュ読み込みは I/O 待ちが主なので、銘柄ごとに並列で読む
+    with ThreadPoolExecutor(max_workers=min(16, len(watchlist))) as executor:
+        results = executor.map(
+            lambda item: get_source(item.category).load_monthly_closes(item.code, start, end),
+            watchlist,
+        )
+        monthly = {item.code: closes for item, closes in zip(watchlist, results) if closes is not None}
+
+    if not monthly:
         st.info("キャッシュ済みのデータがありません。各銘柄を一度表示してください。")
         return
 
-    combined = pd.DataFrame(series)
-    combined.index = combined.index.astype(str)
+    names = {item.code: item.name for item in watchlist}
+    combined = pd.DataFrame(monthly).pct_change(fill_method=None)
+    labels = [names[code] for code in combined.columns]
+    if len(set(labels)) < len(labels):
+        # Styler は列名の重複を扱えないため、表示名が重なる場合はコードを添える
+        labels = [f"{names[code]} ({code})" for code in combined.columns]
+    combined.columns = labels
+    combined.index = combined.index.strftime("%Y-%m")
     combined = combined.iloc[::-1]
 
-    def _color_cell(v: float) -> str:
-        if pd.isna(v):
-            return ""
-        if v > 0:
-            return "color: #16a34a"
-        if v < 0:
-            return "color: #dc2626"
-        return ""
-
-    styled = combined.style.map(_color_cell).format(lambda v: f"{v:+.2%}" if pd.notna(v) else "-")
-    st.dataframe(styled, use_container_width=True)
+    # セルごとのコールバックを避け、文字列と色を配列演算でまとめて作る
+    values = combined.to_numpy()
+    text = np.where(np.isnan(values), "-", np.char.mod("%+.2f%%", values * 100))
+    colors = np.where(values > 0, "color: #16a34a", np.where(values < 0, "color: #dc2626", ""))
+    table = pd.DataFrame(text, index=combined.index, columns=combined.columns)
+    st.dataframe(table.style.apply(lambda _: colors, axis=None), use_container_width=True)
 
 
 if __name__ == "__main__":
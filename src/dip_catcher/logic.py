@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, fields
+from enum import Enum
 
 import numpy as np
 import pandas as pd
@@ -10,6 +11,231 @@ import pandas as pd
 from dip_catcher.models import AnalysisConfig, PriceHistory
 
 
+# ---------------------------------------------------------------------------
+# ndarray カーネル
+# ---------------------------------------------------------------------------
+#
+# 各指標の数値計算本体。1 次元の float 配列を受け取り、同じ長さ・同じ dtype の配列を
+# 返す（計算できない先頭区間は NaN）。float32 を渡しても累積計算は float64 で行う。
+# pandas の Series は公開 API の境界でのみ扱う。
+
+
+def _drawdown_and_peak(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """ドローダウンと、その基準になった累積最高値の配列を返す。"""
+    peak = np.fmax.accumulate(values)
+    dd = np.subtract(values, peak)
+    nonzero = peak != 0
+    np.divide(dd, peak, out=dd, where=nonzero)
+    dd[~nonzero] = np.nan
+    return dd, peak
+
+
+def drawdown_values(values: np.ndarray) -> np.ndarray:
+    """ドローダウン（累積最高値からの下落率）を 1 パスで計算する。"""
+    return _drawdown_and_peak(values)[0]
+
+
+def pct_change_values(values: np.ndarray, periods: int = 1) -> np.ndarray:
+    """periods 日前からの騰落率を計算する。"""
+    out = np.full(len(values), np.nan, dtype=values.dtype)
+    if len(values) > periods:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[periods:] = values[periods:] / values[:-periods] - 1
+    return out
+
+
+def _window_sums(
+    values: np.ndarray, window: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+    """累積和の差分で各ウィンドウの和・二乗和を O(N) で求める。
+
+    桁落ちを抑えるため、二乗和は基準値（先頭の有効値）を引いた値で累積する。
+
+    Returns:
+        (ウィンドウ和, 基準値シフト後の二乗和, NaN を含むウィンドウか, 基準値)
+    """
+    nan_mask = np.isnan(values)
+    finite = values[~nan_mask]
+    ref = float(finite[0]) if len(finite) else 0.0
+    shifted = np.where(nan_mask, 0.0, values.astype(np.float64, copy=False) - ref)
+    c1 = np.concatenate(([0.0], np.cumsum(shifted)))
+    c2 = np.concatenate(([0.0], np.cumsum(shifted * shifted)))
+    cn = np.concatenate(([0], np.cumsum(nan_mask)))
+    s1 = c1[window:] - c1[:-window] + ref * window
+    s2 = c2[window:] - c2[:-window]
+    has_nan = (cn[window:] - cn[:-window]) > 0
+    return s1, s2, has_nan, ref
+
+
+def rolling_mean_values(values: np.ndarray, window: int) -> np.ndarray:
+    """単純移動平均を計算する。"""
+    out = np.full(len(values), np.nan, dtype=values.dtype)
+    if len(values) >= window:
+        s1, _, has_nan, _ = _window_sums(values, window)
+        out[window - 1:] = np.where(has_nan, np.nan, s1 / window)
+    return out
+
+
+def rolling_mean_std_values(values: np.ndarray, window: int) -> tuple[np.ndarray, np.ndarray]:
+    """移動平均と標本標準偏差 (ddof=1) を同じ累積和から計算する。"""
+    n = len(values)
+    mean = np.full(n, np.nan, dtype=values.dtype)
+    std = np.full(n, np.nan, dtype=values.dtype)
+    if n >= window:
+        s1, s2, has_nan, ref = _window_sums(values, window)
+        m = s1 / window
+        d = m - ref
+        var = np.maximum((s2 - window * d * d) / (window - 1), 0.0)
+        mean[window - 1:] = np.where(has_nan, np.nan, m)
+        std[window - 1:] = np.where(has_nan, np.nan, np.sqrt(var))
+    return mean, std
+
+
+def ma_deviation_values(values: np.ndarray, window: int) -> np.ndarray:
+    """移動平均乖離率を計算する。"""
+    ma = rolling_mean_values(values, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (values - ma) / ma
+
+
+def _ewm_values(values: np.ndarray, alpha: float) -> np.ndarray:
+    """adjust=False の指数平滑 (y[0] = x[0], y[i] = (1 - alpha) * y[i-1] + alpha * x[i])。
+
+    漸化式を y[i] = decay^i * (y[0] + Σ alpha * x[j] * decay^-j) に展開し、累積和で
+    ベクトル化する。decay^-k に値を掛けても float64 に収まるよう、decay^-k が 1e150 程度に
+    収まる長さごとにブロックを区切り、前ブロック末尾の値を引き継ぐ。
+    """
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        return values.astype(np.float64)
+    n = len(values)
+    out = np.empty(n)
+    block = max(1, int(150 / -np.log10(decay)))
+    prev = float(values[0])
+    out[0] = prev
+    for start in range(1, n, block):
+        seg = values[start:start + block]
+        k = np.arange(1, len(seg) + 1, dtype=np.float64)
+        out[start:start + len(seg)] = (prev + np.cumsum(alpha * seg * decay ** -k)) * decay ** k
+        prev = out[start + len(seg) - 1]
+    return out
+
+
+def _ewm_last(values: np.ndarray, alpha: float) -> np.float64:
+    """_ewm_values の末尾の値だけを、展開した漸化式の重み付き和 1 回で求める。
+
+    y[n-1] = decay^(n-1) * x[0] + Σ_{j>=1} alpha * decay^(n-1-j) * x[j]。重みは 1 以下なので
+    ブロック分割は要らない（古い項はアンダーフローで 0 になるだけ）。
+    """
+    weights = (1.0 - alpha) ** np.arange(len(values) - 1, -1, -1, dtype=np.float64)
+    weights[1:] *= alpha
+    return weights @ values
+
+
+def rsi_values(values: np.ndarray, period: int = 14) -> np.ndarray:
+    """Wilder's smoothing による RSI を計算する。"""
+    n = len(values)
+    avg_gain = np.full(n, np.nan, dtype=values.dtype)
+    avg_loss = np.full(n, np.nan, dtype=values.dtype)
+    if n > period:
+        delta = np.diff(values.astype(np.float64, copy=False))
+        alpha = 1 / period
+        avg_gain[period:] = _ewm_values(np.maximum(delta, 0.0), alpha)[period - 1:]
+        avg_loss[period:] = _ewm_values(np.maximum(-delta, 0.0), alpha)[period - 1:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 - 100 / (1 + avg_gain / avg_loss)
+
+
+def bollinger_values(
+    values: np.ndarray, period: int = 20, num_std: float = 2.0,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """ボリンジャーバンドを計算する。
+
+    Returns:
+        (middle, upper, lower, percent_b)
+    """
+    middle, std = rolling_mean_std_values(values, period)
+    upper = middle + num_std * std
+    lower = middle - num_std * std
+    band_width = upper - lower
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percent_b = np.where(band_width != 0, (values - lower) / band_width, np.nan)
+    return middle, upper, lower, percent_b
+
+
+def latest_indicator_values(
+    values: np.ndarray, ma_days: int, rsi_period: int, bb_period: int, bb_std: float,
+) -> tuple[float, float, float, float, float]:
+    """末尾時点の指標値だけを計算する（系列全体は作らない）。
+
+    RSI は Wilder の平滑化が全期間に依存するため、全期間の重み付き和として末尾の値を求める。
+    計算できない値は NaN を返す。
+
+    Returns:
+        (ドローダウン, 日次騰落率, 移動平均乖離率, RSI, %B)
+    """
+    n = len(values)
+    last = float(values[-1])
+    peak = float(np.nanmax(values)) if not np.isnan(values).all() else np.nan
+    dd = (last - peak) / peak if peak != 0 else np.nan
+    daily_ret = last / float(values[-2]) - 1 if n > 1 and values[-2] != 0 else np.nan
+
+    ma_dev = np.nan
+    if n >= ma_days:
+        ma = float(values[-ma_days:].mean())
+        ma_dev = (last - ma) / ma if ma != 0 else np.nan
+
+    rsi = np.nan
+    if n > rsi_period:
+        delta = np.diff(values.astype(np.float64, copy=False))
+        avg_gain = _ewm_last(np.maximum(delta, 0.0), 1 / rsi_period)
+        avg_loss = _ewm_last(np.maximum(-delta, 0.0), 1 / rsi_period)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi = float(100 - 100 / (1 + avg_gain / avg_loss))
+
+    percent_b = np.nan
+    if n >= bb_period > 1:
+        window = values[-bb_period:]
+        middle = float(window.mean())
+        width = 2 * bb_std * float(window.std(ddof=1))
+        if width != 0:
+            percent_b = (last - (middle - width / 2)) / width
+
+    return dd, daily_ret, ma_dev, rsi, percent_b
+
+
+def lttb_indices(values: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets で描画用に間引く点のインデックスを返す。
+
+    先頭・末尾を固定し、間を threshold - 2 個のバケットに分けて、前の採用点と
+    次バケットの平均点とで作る三角形の面積が最大の点を各バケットから 1 つ選ぶ。
+    点数が threshold 以下ならすべてのインデックスを返す。
+    先頭の NaN（RSI の助走区間など）は面積が NaN になり選択を狂わせるので、除いた区間を間引く。
+    """
+    n = len(values)
+    if n and np.isnan(values[0]):
+        start = int(np.argmax(~np.isnan(values)))
+        if start:
+            return start + lttb_indices(values[start:], threshold)
+    if threshold < 3 or n <= threshold:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    out = np.empty(threshold, dtype=np.intp)
+    out[0] = 0
+    out[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = (hi + next_hi - 1) / 2
+        avg_y = values[hi:next_hi].mean()
+        xs = np.arange(lo, hi)
+        area = np.abs((a - avg_x) * (values[lo:hi] - values[a]) - (a - xs) * (avg_y - values[a]))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
 # ---------------------------------------------------------------------------
 # 個別指標
 # ---------------------------------------------------------------------------
@@ -20,8 +246,7 @@ def calc_drawdown(closes: pd.Series) -> pd.Series:
 
     戻り値は 0 以下の比率 (例: -0.10 = -10%)。
     """
-    rolling_max = closes.cummax()
-    return (closes - rolling_max) / rolling_max.replace(0, np.nan)
+    return pd.Series(drawdown_values(closes.to_numpy(dtype=np.float64)), index=closes.index)
 
 
 _RECENT_PEAK_MIN_DROP = 0.02
@@ -34,7 +259,11 @@ def calc_recent_peak(closes: pd.Series) -> float:
     そのピークが現在値より2%以上高ければ直近高値として返す。
     回復局面では中間ラリーの山を正しく検出する。
     """
-    values = closes.values
+    return recent_peak_value(closes.to_numpy(dtype=np.float64))
+
+
+def recent_peak_value(values: np.ndarray) -> float:
+    """calc_recent_peak の ndarray 版。"""
     n = len(values)
     if n < 2:
         return float(values[-1])
@@ -49,49 +278,55 @@ def calc_recent_peak(closes: pd.Series) -> float:
             above_current = (peak - latest) / peak
             if drop_from_peak >= _RECENT_PEAK_MIN_DROP and above_current >= _RECENT_PEAK_MIN_DROP:
                 return peak
-    return float(max(values))
+    return float(values.max())
 
 
 def calc_daily_returns(closes: pd.Series) -> pd.Series:
     """日次騰落率を計算する。"""
-    return closes.pct_change().dropna()
+    return calc_cumulative_returns(closes, 1)
 
 
 def calc_cumulative_returns(closes: pd.Series, window: int) -> pd.Series:
     """N日間の累積騰落率を計算する。"""
-    return closes.pct_change(periods=window).dropna()
+    values = pct_change_values(closes.to_numpy(dtype=np.float64), window)
+    return pd.Series(values, index=closes.index).dropna()
 
 
-def calc_return_percentile(returns: pd.Series, current_return: float) -> float:
+def calc_return_percentile(returns: pd.Series | np.ndarray, current_return: float) -> float:
     """現在の騰落率が過去分布の何パーセンタイルに位置するかを返す。
 
     戻り値は 0〜100。値が小さいほど「レアな下落」。
-    <= を使用し、current_return 以下の値の割合を返す。
+    <= を使用し、current_return 以下の値の割合を返す。NaN は除外する。
+    問い合わせは 1 点なので、ソートせず 1 回の比較で数える。
     """
-    values = returns.dropna().values
-    if len(values) == 0:
+    values = np.asarray(returns, dtype=np.float64)
+    n_valid = len(values) - np.count_nonzero(np.isnan(values))
+    if n_valid == 0:
         return 50.0
-    count_below = np.sum(values <= current_return)
-    return float(count_below / len(values) * 100)
+    return float(np.count_nonzero(values <= current_return) / n_valid * 100)
 
 
 _RARITY_WINDOWS = (1, 3, 5)
 
 
-def calc_best_rarity(closes: pd.Series) -> tuple[float, float, int]:
+def calc_best_rarity(closes: pd.Series | np.ndarray) -> tuple[float, float, int]:
     """1日/3日/5日の累積リターンで最もレアなパーセンタイルを返す。
 
+    closes は Series でも ndarray でもよい。
+
     Returns:
         (最小パーセンタイル, 該当リターン, ウィンドウ日数)
     """
+    values = np.asarray(closes, dtype=np.float64)
     best_pct = 50.0
     best_ret = 0.0
     best_window = 1
     for w in _RARITY_WINDOWS:
-        rets = calc_cumulative_returns(closes, w) if w > 1 else calc_daily_returns(closes)
+        rets = pct_change_values(values, w)
+        rets = rets[~np.isnan(rets)]
         if len(rets) == 0:
             continue
-        current = float(rets.iloc[-1])
+        current = float(rets[-1])
         pct = calc_return_percentile(rets, current)
         if pct < best_pct:
             best_pct = pct
@@ -105,8 +340,8 @@ def calc_ma_deviation(closes: pd.Series, window: int) -> pd.Series:
 
     戻り値は比率 (例: -0.05 = 移動平均から-5%乖離)。
     """
-    ma = closes.rolling(window=window, min_periods=window).mean()
-    return (closes - ma) / ma
+    values = ma_deviation_values(closes.to_numpy(dtype=np.float64), window)
+    return pd.Series(values, index=closes.index)
 
 
 def calc_rsi(closes: pd.Series, period: int = 14) -> pd.Series:
@@ -114,16 +349,7 @@ def calc_rsi(closes: pd.Series, period: int = 14) -> pd.Series:
 
     Wilder's smoothing method を使用。戻り値は 0〜100。
     """
-    delta = closes.diff()
-    gain = delta.clip(lower=0)
-    loss = (-delta).clip(lower=0)
-
-    avg_gain = gain.ewm(alpha=1 / period, min_periods=period, adjust=False).mean()
-    avg_loss = loss.ewm(alpha=1 / period, min_periods=period, adjust=False).mean()
-
-    rs = avg_gain / avg_loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
+    return pd.Series(rsi_values(closes.to_numpy(dtype=np.float64), period), index=closes.index)
 
 
 @dataclass
@@ -143,13 +369,16 @@ def calc_bollinger_bands(
 
     percent_b が 0 以下 = 下限バンド割れ（レアな下落）。
     """
-    middle = closes.rolling(window=period, min_periods=period).mean()
-    std = closes.rolling(window=period, min_periods=period).std()
-    upper = middle + num_std * std
-    lower = middle - num_std * std
-    band_width = upper - lower
-    percent_b = (closes - lower) / band_width.replace(0, np.nan)
-    return BollingerBands(middle=middle, upper=upper, lower=lower, percent_b=percent_b)
+    middle, upper, lower, percent_b = bollinger_values(
+        closes.to_numpy(dtype=np.float64), period, num_std,
+    )
+    index = closes.index
+    return BollingerBands(
+        middle=pd.Series(middle, index=index),
+        upper=pd.Series(upper, index=index),
+        lower=pd.Series(lower, index=index),
+        percent_b=pd.Series(percent_b, index=index),
+    )
 
 
 @dataclass
@@ -164,63 +393,57 @@ class DrawdownEvent:
 
 
 def find_drawdown_events(
-    dates: pd.Series, closes: pd.Series, threshold: float = -0.05
+    dates: pd.Series | np.ndarray, closes: pd.Series | np.ndarray, threshold: float = -0.05
 ) -> list[DrawdownEvent]:
     """過去のドローダウンイベントを検出する。
 
     threshold 以下の下落が発生した区間を一覧化し、回復情報を付与する。
     回復 = ドローダウンがゼロに戻る（＝高値を更新する）こと。
+    dates / closes は Series でも ndarray でもよい。
     """
-    dd = calc_drawdown(closes)
-    dd_values = dd.values
-    close_values = closes.values
-    date_values = dates.values
+    close_values = np.asarray(closes, dtype=np.float64)
+    date_values = np.asarray(dates)
+    dd_values, running_peak = _drawdown_and_peak(close_values)
+    # 各時点の累積最高値が最後に付いた位置（ドローダウン開始時のピーク位置）
+    positions = np.arange(len(close_values))
+    peak_positions = np.maximum.accumulate(np.where(close_values == running_peak, positions, 0))
+
+    # 高値更新点（ドローダウン 0）ごとに区間を切り、threshold を下回った区間をイベントとする。
+    # イベントは区間内で最初に threshold を下回った時点で始まり、次の高値更新で回復する。
+    valid = ~np.isnan(dd_values)
+    at_peak = valid & (dd_values >= 0)
+    below = np.flatnonzero(valid & (dd_values < threshold))
+    if len(below) == 0:
+        return []
+    segment = np.cumsum(at_peak)[below]
+    first_below = np.concatenate(([True], segment[1:] != segment[:-1]))
+    entries = below[first_below]
+    segments = segment[first_below]
+
+    # 区間ごとの最安値（同値なら最初の時点）。lexsort は安定なので時系列順が保たれる
+    by_depth = np.lexsort((dd_values[below], segment))
+    first_in_segment = np.concatenate(([True], np.diff(segment[by_depth]) != 0))
+    troughs = below[by_depth][first_in_segment]
+
+    peaks = peak_positions[entries]
+    # 区間 s の回復点は s 番目の高値更新点（最後の区間は未回復 = -1）
+    recoveries = np.append(np.flatnonzero(at_peak), -1)[segments]
+
+    # 回復日数は日単位の datetime64 の差で一括計算する（未回復は使わない）
+    recovery_days = (
+        date_values[recoveries].astype("datetime64[D]") - date_values[troughs].astype("datetime64[D]")
+    ).astype(np.int64).tolist()
 
     events: list[DrawdownEvent] = []
-    in_drawdown = False
-    peak_idx = 0
-    trough_idx = 0
-    trough_dd = 0.0
-
-    for i in range(len(dd_values)):
-        dd_val = dd_values[i]
-        if np.isnan(dd_val):
-            continue
-        if dd_val < threshold:
-            if not in_drawdown:
-                in_drawdown = True
-                # ピーク = 直前のcummax値に一致する最も近い位置を逆順探索
-                peak_val = closes.cummax().iloc[i]
-                peak_idx = i
-                for j in range(i - 1, -1, -1):
-                    if close_values[j] == peak_val:
-                        peak_idx = j
-                        break
-                trough_idx = i
-                trough_dd = dd_val
-            elif dd_val < trough_dd:
-                trough_idx = i
-                trough_dd = dd_val
-        elif in_drawdown and dd_val >= 0:
-            events.append(
-                DrawdownEvent(
-                    peak_date=pd.Timestamp(date_values[peak_idx]),
-                    trough_date=pd.Timestamp(date_values[trough_idx]),
-                    max_drawdown=trough_dd,
-                    recovery_date=pd.Timestamp(date_values[i]),
-                    recovery_days=(pd.Timestamp(date_values[i]) - pd.Timestamp(date_values[trough_idx])).days,
-                )
-            )
-            in_drawdown = False
-
-    if in_drawdown:
+    for peak_idx, trough_idx, recovery_idx, days in zip(peaks, troughs, recoveries, recovery_days):
+        recovered = recovery_idx >= 0
         events.append(
             DrawdownEvent(
                 peak_date=pd.Timestamp(date_values[peak_idx]),
                 trough_date=pd.Timestamp(date_values[trough_idx]),
-                max_drawdown=trough_dd,
-                recovery_date=None,
-                recovery_days=None,
+                max_drawdown=float(dd_values[trough_idx]),
+                recovery_date=pd.Timestamp(date_values[recovery_idx]) if recovered else None,
+                recovery_days=days if recovered else None,
             )
         )
 
@@ -252,14 +475,24 @@ class IndicatorScores:
     bollinger: float
 
 
+class SignalLabel(str, Enum):
+    """総合スコアから決まる判定ラベル。"""
+
+    STRONG_BUY = "強い買い場"
+    CONSIDER = "買い場検討"
+    NEUTRAL = "様子見"
+    WAIT = "待機"
+
+
 @dataclass
 class AnalysisResult:
     """分析結果の全体像。"""
 
     scores: IndicatorScores
     total_score: float  # 0〜100
-    label: str  # 判定ラベル
+    label: SignalLabel
     current_drawdown: float  # 最高値からのドローダウン値
+    recent_drawdown: float  # 直近高値（calc_recent_peak）からの下落率
     current_daily_return: float  # 直近日次リターン（前日比）
     current_rsi: float
     current_ma_deviation: float
@@ -270,13 +503,18 @@ class AnalysisResult:
     drawdown_events: list[DrawdownEvent]
 
 
+def _clip_score(score: float) -> float:
+    """スコアを 0〜100 に丸める（スカラー用。np.clip の 0 次元配列化を避ける）。"""
+    return float(min(max(score, 0.0), 100.0))
+
+
 def _score_drawdown(dd: float) -> float:
     """ドローダウン深度をスコア化する。
 
     0% → 0点, -15% → 50点, -30%以下 → 100点（線形補間）
     """
     depth = abs(dd)
-    return float(np.clip(depth / _DD_MAX * 100, 0, 100))
+    return _clip_score(depth / _DD_MAX * 100)
 
 
 _STABILIZATION_BONUS = 1.15  # 安定化パターン（window > 1）: スコア +15%
@@ -294,7 +532,7 @@ def _score_rarity(percentile: float, window: int) -> float:
         return 0.0
     base = (_RARITY_UPPER - percentile) / _RARITY_UPPER * 100
     modifier = _STABILIZATION_BONUS if window > 1 else _PANIC_PENALTY
-    return float(np.clip(base * modifier, 0, 100))
+    return _clip_score(base * modifier)
 
 
 def _score_rsi(rsi: float) -> float:
@@ -304,7 +542,7 @@ def _score_rsi(rsi: float) -> float:
     """
     if rsi >= _RSI_UPPER:
         return 0.0
-    return float(np.clip((_RSI_UPPER - rsi) / (_RSI_UPPER - _RSI_LOWER) * 100, 0, 100))
+    return _clip_score((_RSI_UPPER - rsi) / (_RSI_UPPER - _RSI_LOWER) * 100)
 
 
 def _score_ma_deviation(deviation: float) -> float:
@@ -315,7 +553,7 @@ def _score_ma_deviation(deviation: float) -> float:
     if deviation >= 0:
         return 0.0
     depth = abs(deviation)
-    return float(np.clip(depth / _MA_DEV_MAX * 100, 0, 100))
+    return _clip_score(depth / _MA_DEV_MAX * 100)
 
 
 def _score_bollinger(percent_b: float) -> float:
@@ -325,7 +563,7 @@ def _score_bollinger(percent_b: float) -> float:
     """
     if percent_b >= _BB_UPPER:
         return 0.0
-    return float(np.clip((_BB_UPPER - percent_b) / (_BB_UPPER - _BB_LOWER) * 100, 0, 100))
+    return _clip_score((_BB_UPPER - percent_b) / (_BB_UPPER - _BB_LOWER) * 100)
 
 
 _WEIGHTS = {
@@ -337,52 +575,49 @@ _WEIGHTS = {
 }
 
 assert abs(sum(_WEIGHTS.values()) - 1.0) < 1e-9, f"Weights must sum to 1.0, got {sum(_WEIGHTS.values())}"
+assert {f.name for f in fields(IndicatorScores)} == _WEIGHTS.keys(), (
+    f"Weight keys {set(_WEIGHTS)} do not match score fields {[f.name for f in fields(IndicatorScores)]}"
+)
 
 
 def _total_score(scores: IndicatorScores) -> float:
     """加重平均で総合スコアを計算する。"""
-    score_fields = {f.name for f in fields(scores)}
-    weight_fields = set(_WEIGHTS.keys())
-    if score_fields != weight_fields:
-        raise ValueError(f"Weight keys {weight_fields} do not match score fields {score_fields}")
-    raw = sum(getattr(scores, name) * weight for name, weight in _WEIGHTS.items())
-    return float(np.clip(raw, 0, 100))
+    return _clip_score(
+        scores.drawdown * _WEIGHTS["drawdown"]
+        + scores.rarity * _WEIGHTS["rarity"]
+        + scores.rsi * _WEIGHTS["rsi"]
+        + scores.ma_deviation * _WEIGHTS["ma_deviation"]
+        + scores.bollinger * _WEIGHTS["bollinger"]
+    )
 
 
-def _label_from_score(score: float) -> str:
+def _label_from_score(score: float) -> SignalLabel:
     """スコアから判定ラベルを返す。"""
     if score >= 80:
-        return "強い買い場"
+        return SignalLabel.STRONG_BUY
     if score >= 60:
-        return "買い場検討"
+        return SignalLabel.CONSIDER
     if score >= 40:
-        return "様子見"
-    return "待機"
+        return SignalLabel.NEUTRAL
+    return SignalLabel.WAIT
 
 
 def analyze(history: PriceHistory, config: AnalysisConfig) -> AnalysisResult:
     """全指標を計算し、総合スコアを返す。"""
-    closes = history.df["close"].reset_index(drop=True)
-    dates = history.df["date"].reset_index(drop=True)
-
-    # 個別指標の計算
-    dd_series = calc_drawdown(closes)
-    current_dd = float(dd_series.iloc[-1]) if not np.isnan(dd_series.iloc[-1]) else 0.0
-
-    daily_ret = calc_daily_returns(closes)
-    current_ret = float(daily_ret.iloc[-1]) if len(daily_ret) > 0 else 0.0
-    percentile, rarity_ret, rarity_win = calc_best_rarity(closes)
-
-    ma_dev_series = calc_ma_deviation(closes, config.ma_days)
-    current_ma_dev = float(ma_dev_series.iloc[-1]) if not np.isnan(ma_dev_series.iloc[-1]) else 0.0
-
-    rsi_series = calc_rsi(closes, config.rsi_period)
-    current_rsi = float(rsi_series.iloc[-1]) if not np.isnan(rsi_series.iloc[-1]) else 50.0
-
-    bb = calc_bollinger_bands(closes, config.bb_period, config.bb_std)
-    current_bb = float(bb.percent_b.iloc[-1]) if not np.isnan(bb.percent_b.iloc[-1]) else 0.5
+    # 個別指標の計算（末尾時点の値のみ）
+    dd, daily_ret, ma_dev, rsi, percent_b = latest_indicator_values(
+        history.closes, config.ma_days, config.rsi_period, config.bb_period, config.bb_std,
+    )
+    current_dd = 0.0 if np.isnan(dd) else dd
+    current_ret = 0.0 if np.isnan(daily_ret) else daily_ret
+    current_ma_dev = 0.0 if np.isnan(ma_dev) else ma_dev
+    current_rsi = 50.0 if np.isnan(rsi) else rsi
+    current_bb = 0.5 if np.isnan(percent_b) else percent_b
+    percentile, rarity_ret, rarity_win = calc_best_rarity(history.closes)
+    recent_high = recent_peak_value(history.closes)
+    recent_dd = (history.latest_close - recent_high) / recent_high if recent_high > 0 else 0.0
 
-    dd_events = find_drawdown_events(dates, closes)
+    dd_events = find_drawdown_events(history.dates, history.closes)
 
     # スコアリング
     scores = IndicatorScores(
@@ -399,6 +634,7 @@ def analyze(history: PriceHistory, config: AnalysisConfig) -> AnalysisResult:
         total_score=total,
         label=_label_from_score(total),
         current_drawdown=current_dd,
+        recent_drawdown=recent_dd,
         current_daily_return=current_ret,
         current_rsi=current_rsi,
         current_ma_deviation=current_ma_dev,
@@ -3,11 +3,12 @@
 from __future__ import annotations
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
 from typing import NamedTuple
 
+import numpy as np
 import streamlit as st
-import yfinance as yf
 
 from dip_catcher.models import AppConfig, WatchlistItem
 from dip_catcher.sources import get_source
@@ -47,6 +48,12 @@ MARKET_TICKERS = (
     MarketTicker("^TWII", "台湾", "asia"),
 )
 
+# カテゴリ別の銘柄（MARKET_TICKERS の出現順）。rerun ごとに組み直さないよう読み込み時に作る
+_CATEGORIES: dict[str, tuple[MarketTicker, ...]] = {
+    cat: tuple(t for t in MARKET_TICKERS if t.category == cat)
+    for cat in dict.fromkeys(t.category for t in MARKET_TICKERS)
+}
+
 _CATEGORY_LABELS: dict[str, str] = {
     "watchlist": "📋 監視リスト",
     "japan": "🇯🇵 日本",
@@ -59,6 +66,10 @@ _CATEGORY_LABELS: dict[str, str] = {
 
 _INVERSE_DELTA_SYMBOLS = frozenset({"^VIX"})
 
+# 一括ダウンロード用のシンボル列と、同じ並びの「上昇が悪材料」フラグ
+_SYMBOLS: tuple[str, ...] = tuple(t.symbol for t in MARKET_TICKERS)
+_IS_INVERSE: tuple[bool, ...] = tuple(t.symbol in _INVERSE_DELTA_SYMBOLS for t in MARKET_TICKERS)
+
 _COLS_PER_ROW = 5
 
 _CARD_CSS = """\
@@ -104,10 +115,11 @@ class _TickerData(NamedTuple):
 @st.cache_data(ttl=300, show_spinner="市場データを取得中…")
 def _fetch_market_data() -> dict[str, _TickerData]:
     """全銘柄を一括取得し、各銘柄の現在価格・前日比を返す。"""
-    symbols = [t.symbol for t in MARKET_TICKERS]
+    import yfinance as yf
+
     try:
         raw = yf.download(
-            symbols, period="5d", interval="1h", group_by="ticker", progress=False,
+            _SYMBOLS, period="5d", interval="1h", group_by="ticker", progress=False,
         )
     except Exception:
         logger.exception("yf.download failed")
@@ -116,42 +128,56 @@ def _fetch_market_data() -> dict[str, _TickerData]:
     if raw.empty:
         return {}
 
-    result: dict[str, _TickerData] = {}
-    for ticker in MARKET_TICKERS:
-        try:
-            if len(symbols) == 1:
-                ticker_df = raw
-            else:
-                ticker_df = raw[ticker.symbol]
-
-            ticker_df.columns = [c.lower() if isinstance(c, str) else c for c in ticker_df.columns]
-            closes = ticker_df["close"].dropna()
-            if len(closes) < 2:
-                continue
-
-            current = float(closes.iloc[-1])
-
-            unique_dates = closes.index.normalize().unique()
-            if len(unique_dates) < 2:
-                prev_close = float(closes.iloc[0])
-            else:
-                prev_date = unique_dates[-2]
-                prev_mask = closes.index.normalize() == prev_date
-                prev_close = float(closes[prev_mask].iloc[-1])
-
-            change_pct = ((current - prev_close) / prev_close) * 100 if prev_close != 0 else 0.0
-
-            result[ticker.symbol] = _TickerData(
-                name=ticker.name,
-                price=current,
-                change_pct=change_pct,
-                is_inverse=ticker.symbol in _INVERSE_DELTA_SYMBOLS,
-            )
-        except (KeyError, IndexError, TypeError):
-            logger.warning("Skipping ticker %s: data extraction failed", ticker.symbol, exc_info=True)
-            continue
+    # 終値を [時刻, 銘柄] の行列にまとめ、現在値と前営業日終値を全銘柄まとめて求める
+    is_close = raw.columns.get_level_values(-1).astype(str).str.lower() == "close"
+    closes = raw.loc[:, is_close]
+    closes.columns = closes.columns.get_level_values(0)
+    matrix = closes.reindex(columns=_SYMBOLS).to_numpy(dtype=np.float64)
+    days = np.unique(raw.index.normalize(), return_inverse=True)[1]
+
+    valid = ~np.isnan(matrix)
+    rows = np.arange(len(matrix))[:, None]
+    cols = np.arange(len(_SYMBOLS))
+    last_row = np.where(valid, rows, -1).max(axis=0)
+    current = matrix[last_row, cols]
+    # 最終データ日より前で最後の終値（前日がなければ期間最初の終値）
+    prev_row = np.where(valid & (days[:, None] < days[last_row]), rows, -1).max(axis=0)
+    prev_row = np.where(prev_row >= 0, prev_row, valid.argmax(axis=0))
+    prev_close = matrix[prev_row, cols]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change_pct = np.where(prev_close != 0, (current - prev_close) / prev_close * 100, 0.0)
+
+    return {
+        ticker.symbol: _TickerData(
+            name=ticker.name,
+            price=float(current[j]),
+            change_pct=float(change_pct[j]),
+            is_inverse=_IS_INVERSE[j],
+        )
+        for j, ticker in enumerate(MARKET_TICKERS)
+        if valid[:, j].sum() >= 2
+    }
 
-    return result
+
+def _load_watchlist_item(item: WatchlistItem, start: date, end: date) -> _TickerData | None:
+    """1 銘柄のキャッシュから現在値と前日比を求める。データがなければ None。"""
+    try:
+        cached = get_source(item.category).load_cache(item.code, start, end)
+        if cached is None or len(cached.df) < 2:
+            return None
+        df = cached.df.sort_values("date")
+        current = float(df["close"].iloc[-1])
+        prev = float(df["close"].iloc[-2])
+        change_pct = ((current - prev) / prev) * 100 if prev != 0 else 0.0
+        return _TickerData(
+            name=item.name,
+            price=current,
+            change_pct=change_pct,
+            is_inverse=False,
+        )
+    except Exception:
+        logger.warning("Watchlist item %s: data load failed", item.code, exc_info=True)
+        return None
 
 
 def _load_watchlist_data(watchlist: list[WatchlistItem]) -> list[_TickerData]:
@@ -159,27 +185,10 @@ def _load_watchlist_data(watchlist: list[WatchlistItem]) -> list[_TickerData]:
     end = date.today()
     start = end - timedelta(days=30)
 
-    items: list[_TickerData] = []
-    for item in watchlist:
-        try:
-            source = get_source(item.category)
-            cached = source.load_cache(item.code, start, end)
-            if cached is None or len(cached.df) < 2:
-                continue
-            df = cached.df.sort_values("date")
-            current = float(df["close"].iloc[-1])
-            prev = float(df["close"].iloc[-2])
-            change_pct = ((current - prev) / prev) * 100 if prev != 0 else 0.0
-            items.append(_TickerData(
-                name=item.name,
-                price=current,
-                change_pct=change_pct,
-                is_inverse=False,
-            ))
-        except Exception:
-            logger.warning("Watchlist item %s: data load failed", item.code, exc_info=True)
-            continue
-    return items
+    # キャッシュ読み込みは I/O 待ちが主なので、銘柄ごとに並列で読む
+    with ThreadPoolExecutor(max_workers=min(16, len(watchlist))) as executor:
+        results = executor.map(lambda item: _load_watchlist_item(item, start, end), watchlist)
+        return [td for td in results if td is not None]
 
 
 def _format_price(price: float, symbol: str) -> str:
@@ -251,11 +260,7 @@ def render_market_overview(config: AppConfig) -> None:
         st.warning("市場データを取得できませんでした。しばらくしてから再度お試しください。")
         return
 
-    categories: dict[str, list[MarketTicker]] = {}
-    for ticker in MARKET_TICKERS:
-        categories.setdefault(ticker.category, []).append(ticker)
-
-    for cat_key, tickers in categories.items():
+    for cat_key, tickers in _CATEGORIES.items():
         available = [t for t in tickers if t.symbol in data]
         if not available:
             continue
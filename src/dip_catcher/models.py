@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import hashlib
 from enum import Enum
+from functools import cached_property
 
+import numpy as np
 import pandas as pd
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class AssetCategory(str, Enum):
@@ -16,7 +19,12 @@ class AssetCategory(str, Enum):
 
 
 class WatchlistItem(BaseModel):
-    """監視リストの1銘柄。"""
+    """監視リストの1銘柄。
+
+    検証はフォーム入力と設定ファイル読み込みの 1 回だけ行い、以降は不変の値として共有する。
+    """
+
+    model_config = ConfigDict(frozen=True)
 
     code: str = Field(
         description="銘柄コード (例: AAPL, 7203, 03314228)",
@@ -56,7 +64,37 @@ class PriceHistory:
             raise ValueError(f"Missing columns: {missing}")
         if df.empty:
             raise ValueError("DataFrame must not be empty")
-        self.df = df.sort_values("date").reset_index(drop=True)
+        # データソースやキャッシュからの df は通常すでに日付順なので、その場合はソートしない
+        if not df["date"].is_monotonic_increasing:
+            df = df.sort_values("date")
+        self.df = df.reset_index(drop=True)
+
+    @cached_property
+    def closes(self) -> np.ndarray:
+        """終値の float64 配列（df と同じ並び）。"""
+        return self.df["close"].to_numpy(dtype=np.float64, copy=False)
+
+    @cached_property
+    def dates(self) -> np.ndarray:
+        """日付の datetime64 配列（df と同じ並び）。"""
+        return self.df["date"].to_numpy(copy=False)
+
+    @cached_property
+    def iso_dates(self) -> np.ndarray:
+        """チャート描画用の日付文字列配列 (YYYY-MM-DD)。"""
+        return np.datetime_as_string(self.dates, unit="D")
+
+    @cached_property
+    def closes32(self) -> np.ndarray:
+        """チャート描画用の終値 float32 配列。スコア計算には closes を使う。"""
+        return self.closes.astype(np.float32)
+
+    @cached_property
+    def content_hash(self) -> str:
+        """日付・終値の内容ハッシュ。キャッシュキーとして使う。"""
+        digest = hashlib.blake2b(self.dates.tobytes(), digest_size=16)
+        digest.update(self.closes.tobytes())
+        return digest.hexdigest()
 
     @property
     def latest_date(self) -> pd.Timestamp:
@@ -1,12 +1,18 @@
 from __future__ import annotations
 
 import logging
+import os
 import re
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from datetime import date, datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 from dip_catcher.sources.base import DataSource
 
@@ -20,6 +26,12 @@ MIN_REFRESH_INTERVAL = timedelta(hours=3)
 # 基準価額の公表時刻（この時刻以降にデータが更新される想定）
 _PUBLISH_HOUR = 10
 
+# 読み込み済みキャッシュをメモリに保持する銘柄数
+_MEMORY_CACHE_SIZE = 64
+
+# 月次集計ファイルに記録する、集計元の日次キャッシュの版
+_SOURCE_VERSION_KEY = b"dip_catcher.source_version"
+
 
 # ---------------------------------------------------------------------------
 # 日本の祝日・営業日判定
@@ -42,6 +54,14 @@ _FIXED_HOLIDAYS = {
 
 def _is_jp_holiday(d: date) -> bool:
     """日本の祝日かどうかを判定する（主要な固定祝日＋ハッピーマンデー）。"""
+    if _is_jp_holiday_no_substitute(d):
+        return True
+    # 振替休日：祝日が日曜の場合、翌月曜が休み
+    return d.weekday() == 0 and _is_jp_holiday_no_substitute(d - timedelta(days=1))
+
+
+def _is_jp_holiday_no_substitute(d: date) -> bool:
+    """振替休日を除いた祝日判定。"""
     month, day = d.month, d.day
 
     if (month, day) in _FIXED_HOLIDAYS:
@@ -64,39 +84,15 @@ def _is_jp_holiday(d: date) -> bool:
         return True
     if month == 9 and day in (22, 23):
         return True
-
-    # 振替休日：祝日が日曜の場合、翌月曜が休み
-    yesterday = d - timedelta(days=1)
-    if d.weekday() == 0 and _is_jp_holiday_no_substitute(yesterday):
-        return True
-
-    return False
-
-
-def _is_jp_holiday_no_substitute(d: date) -> bool:
-    """振替休日を除いた祝日判定（再帰防止用）。"""
-    month, day = d.month, d.day
-    if (month, day) in _FIXED_HOLIDAYS:
-        return True
-    if d.weekday() == 0:
-        week_num = (day - 1) // 7 + 1
-        if month == 1 and week_num == 2:
-            return True
-        if month == 7 and week_num == 3:
-            return True
-        if month == 9 and week_num == 3:
-            return True
-        if month == 10 and week_num == 2:
-            return True
-    if month == 3 and day in (20, 21):
-        return True
-    if month == 9 and day in (22, 23):
-        return True
     return False
 
 
+@lru_cache(maxsize=64)
 def is_jp_business_day(d: date) -> bool:
-    """日本の営業日かどうかを判定する。"""
+    """日本の営業日かどうかを判定する。
+
+    銘柄ごとの needs_refresh から同じ日付で繰り返し呼ばれるため、結果をキャッシュする。
+    """
     if d.weekday() >= 5:  # 土日
         return False
     return not _is_jp_holiday(d)
@@ -106,6 +102,37 @@ def is_jp_business_day(d: date) -> bool:
 # FetchResult / CachedSource
 # ---------------------------------------------------------------------------
 
+_UNSAFE_CODE_CHARS = re.compile(r"[^\w\-.]")
+
+
+@lru_cache(maxsize=1024)
+def _safe_code(code: str) -> str:
+    """銘柄コードをファイル名に使える形にする（パス区切りや .. を含めない）。"""
+    safe_code = _UNSAFE_CODE_CHARS.sub("_", code)
+    if not safe_code or safe_code in (".", ".."):
+        return "_invalid_"
+    return safe_code
+
+
+def _file_version(stat: os.stat_result) -> tuple[int, int, int]:
+    """ファイルの版を表すキー。
+
+    mtime の分解能が粗いファイルシステムでは同じ刻みの書き換えを mtime だけで区別できない。
+    書き込みは os.replace による置き換えなので、サイズと inode も合わせて見る。
+    """
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def _encode_version(version: tuple[int, int, int]) -> bytes:
+    """ファイルの版を Parquet のメタデータに書ける形にする。"""
+    return ",".join(map(str, version)).encode()
+
+
+@lru_cache(maxsize=1)
+def _parquet_compression() -> str | None:
+    """zstd を組み込んだ pyarrow なら zstd、組み込まれていないビルドなら無圧縮で書く。"""
+    return "zstd" if pa.Codec.is_available("zstd") else None
+
 
 @dataclass
 class FetchResult:
@@ -123,7 +150,7 @@ class FetchResult:
 
 
 class CachedSource:
-    """ローカルCSVキャッシュ付きデータソース。
+    """ローカル Parquet キャッシュ付きデータソース。
 
     キャッシュが存在する場合は差分のみを取得し、結合する。
     データソース障害時はキャッシュデータにフォールバックする。
@@ -133,24 +160,100 @@ class CachedSource:
         self._source = source
         self._data_dir = data_dir or _DATA_DIR
         self._data_dir.mkdir(parents=True, exist_ok=True)
+        # 月次集計は日次キャッシュと名前が衝突しないよう別ディレクトリに置く
+        self._monthly_dir = self._data_dir / "monthly"
+        self._monthly_dir.mkdir(exist_ok=True)
+        # キャッシュファイルごとのロック。取得中に旧 CSV の移行へ入ることがあるので再入可能にする
+        self._fetch_locks: dict[Path, threading.RLock] = {}
+        # 読み込み済みのキャッシュ (ファイルの版, df)。ファイルが更新されるまで読み直さない
+        self._frames: OrderedDict[Path, tuple[tuple[int, int, int], pd.DataFrame]] = OrderedDict()
+        self._frames_lock = threading.Lock()
 
     def _cache_path(self, code: str) -> Path:
-        safe_code = re.sub(r"[^\w\-.]", "_", code)
-        if not safe_code or safe_code in (".", ".."):
-            safe_code = "_invalid_"
-        return self._data_dir / f"{safe_code}.csv"
+        return self._data_dir / f"{_safe_code(code)}.parquet"
+
+    def _fetch_lock(self, path: Path) -> threading.RLock:
+        return self._fetch_locks.setdefault(path, threading.RLock())
+
+    def _stat_cache(self, path: Path) -> os.stat_result | None:
+        """キャッシュファイルの stat を返す（存在確認を兼ねて 1 回だけ呼ぶ）。
+
+        ファイルがなければ旧形式 CSV からの移行を試み、それもなければ None を返す。
+        """
+        try:
+            return path.stat()
+        except FileNotFoundError:
+            pass
+        if not self._migrate_legacy_csv(path):
+            return None
+        return path.stat()
+
+    def _migrate_legacy_csv(self, path: Path) -> bool:
+        """旧形式の CSV キャッシュがあれば Parquet に変換する（mtime は引き継ぐ）。
+
+        並列の更新や別セッションと同時に呼ばれうるので、ロック内で移行済みかを確かめ直す。
+        """
+        legacy = path.with_suffix(".csv")
+        with self._fetch_lock(path):
+            if path.exists():
+                return True
+            try:
+                stat = legacy.stat()
+                df = pd.read_csv(legacy, parse_dates=["date"], date_format="ISO8601")
+            except FileNotFoundError:
+                # 別プロセスが移行して CSV を消した直後
+                return path.exists()
+            self._save_cache(path, df)
+            os.utime(path, (stat.st_atime, stat.st_mtime))
+            legacy.unlink(missing_ok=True)
+        return True
+
+    def cache_version(self, code: str) -> tuple[int, int, int] | None:
+        """ディスクキャッシュの版 (mtime_ns, サイズ, inode) を返す。キャッシュがなければ None。"""
+        stat = self._stat_cache(self._cache_path(code))
+        return None if stat is None else _file_version(stat)
 
     def load_cache(self, code: str, start: date, end: date) -> FetchResult | None:
         """ディスクキャッシュからデータを読み込む（ネットワーク不要）。"""
-        cache_path = self._cache_path(code)
-        cached_df = self._load_cache(cache_path)
-        if cached_df is None:
+        loaded = self._load_cache(self._cache_path(code))
+        if loaded is None:
             return None
-        last_modified = datetime.fromtimestamp(cache_path.stat().st_mtime)
+        cached_df, stat = loaded
         filtered = self._filter(cached_df, start, end)
         if filtered.empty:
             return None
-        return FetchResult(df=filtered, last_modified=last_modified)
+        return FetchResult(df=filtered, last_modified=datetime.fromtimestamp(stat.st_mtime))
+
+    def load_monthly_closes(self, code: str, start: date, end: date) -> pd.Series | None:
+        """月末終値（index は月初日）をディスクキャッシュから返す（ネットワーク不要）。
+
+        集計結果は monthly/ 以下に集計元の日次キャッシュの版と一緒に保存し、
+        日次キャッシュがその版のままなら再利用する。
+        """
+        cache_path = self._cache_path(code)
+        cache_stat = self._stat_cache(cache_path)
+        if cache_stat is None:
+            return None
+        monthly_path = self._monthly_dir / cache_path.name
+        monthly = self._load_monthly(monthly_path, _file_version(cache_stat))
+        if monthly is None:
+            loaded = self._load_cache(cache_path)
+            if loaded is None:
+                return None
+            cached_df, stat = loaded
+            month = cached_df["date"].to_numpy().astype("datetime64[M]")
+            monthly = cached_df["close"].groupby(month).last().rename_axis("month").reset_index()
+            monthly["month"] = monthly["month"].astype("datetime64[ns]")
+            # 実際に読んだ日次キャッシュの版を記録する（読み込み後の書き換えは次回に集計し直す）
+            source_version = _encode_version(_file_version(stat))
+            self._save_cache(monthly_path, monthly, {_SOURCE_VERSION_KEY: source_version})
+
+        first = pd.Timestamp(start.year, start.month, 1)
+        last = pd.Timestamp(end.year, end.month, 1)
+        mask = (monthly["month"] >= first) & (monthly["month"] <= last)
+        if not mask.any():
+            return None
+        return monthly.loc[mask].set_index("month")["close"]
 
     def needs_refresh(self, code: str) -> bool:
         """キャッシュが古く、更新が必要かどうかを判定する。
@@ -163,9 +266,10 @@ class CachedSource:
         5. 前回更新から 3 時間未満 → 更新不要
         6. 上記いずれでもない → 更新必要
         """
-        cache_path = self._cache_path(code)
-        if not cache_path.exists():
+        stat = self._stat_cache(self._cache_path(code))
+        if stat is None:
             return True
+        mtime = datetime.fromtimestamp(stat.st_mtime)
 
         now = datetime.now()
         today = now.date()
@@ -178,8 +282,6 @@ class CachedSource:
         if now.hour < _PUBLISH_HOUR:
             return False
 
-        mtime = datetime.fromtimestamp(cache_path.stat().st_mtime)
-
         # 本日 10:00 以降に更新（fetch or touch）済みなら再取得不要
         if mtime.date() == today and mtime.hour >= _PUBLISH_HOUR:
             return False
@@ -191,19 +293,30 @@ class CachedSource:
         return True
 
     def fetch(self, code: str, start: date, end: date) -> FetchResult:
+        """差分取得してキャッシュを更新する。
+
+        同じ銘柄の取得は銘柄ごとのロックで直列化し、後の呼び出しは先の結果への差分取得になる。
+        """
+        with self._fetch_lock(self._cache_path(code)):
+            return self._fetch(code, start, end)
+
+    def _fetch(self, code: str, start: date, end: date) -> FetchResult:
         cache_path = self._cache_path(code)
-        cached_df = self._load_cache(cache_path)
+        cached_df: pd.DataFrame | None = None
+        loaded = self._load_cache(cache_path)
 
-        if cached_df is not None:
-            fetch_start = self._next_fetch_start(cached_df, start, cache_path)
+        if loaded is not None:
+            cached_df, cache_stat = loaded
+            mtime = datetime.fromtimestamp(cache_stat.st_mtime)
+            fetch_start = self._next_fetch_start(cached_df, start, mtime)
             if fetch_start > end:
                 logger.info("Cache is up-to-date for %s", code)
-                # mtime を更新して「確認済み」を記録する
-                cache_path.touch()
-                last_modified = datetime.fromtimestamp(cache_path.stat().st_mtime)
+                # mtime を現在時刻に更新して「確認済み」を記録する
+                checked_at = datetime.now()
+                os.utime(cache_path, (checked_at.timestamp(), checked_at.timestamp()))
                 return FetchResult(
                     self._filter(cached_df, start, end),
-                    last_modified=last_modified,
+                    last_modified=checked_at,
                 )
         else:
             fetch_start = start
@@ -217,11 +330,10 @@ class CachedSource:
                     code,
                     cached_df["date"].max(),
                 )
-                last_modified = datetime.fromtimestamp(cache_path.stat().st_mtime)
                 return FetchResult(
                     self._filter(cached_df, start, end),
                     is_fallback=True,
-                    last_modified=last_modified,
+                    last_modified=mtime,
                 )
             raise
 
@@ -232,23 +344,55 @@ class CachedSource:
             self._filter(merged, start, end), last_modified=last_modified,
         )
 
-    def _load_cache(self, path: Path) -> pd.DataFrame | None:
-        if not path.exists():
+    def _load_cache(self, path: Path) -> tuple[pd.DataFrame, os.stat_result] | None:
+        """キャッシュとその stat を返す。返す DataFrame は共有されるため変更しないこと。"""
+        stat = self._stat_cache(path)
+        if stat is None:
             return None
-        df = pd.read_csv(path, parse_dates=["date"])
+        version = _file_version(stat)
+        with self._frames_lock:
+            hit = self._frames.get(path)
+            if hit is not None and hit[0] == version:
+                self._frames.move_to_end(path)
+                return hit[1], stat
+
+        df = pd.read_parquet(path, columns=["date", "close"])
         if df.empty:
             return None
-        return df
-
-    def _save_cache(self, path: Path, df: pd.DataFrame) -> None:
-        df.to_csv(path, index=False)
+        with self._frames_lock:
+            self._frames[path] = (version, df)
+            self._frames.move_to_end(path)
+            if len(self._frames) > _MEMORY_CACHE_SIZE:
+                self._frames.popitem(last=False)
+        return df, stat
+
+    def _load_monthly(self, path: Path, version: tuple[int, int, int]) -> pd.DataFrame | None:
+        """月次集計を読む。なければ、または集計元の日次キャッシュの版が違えば None。"""
+        try:
+            table = pq.read_table(path)
+        except FileNotFoundError:
+            return None
+        metadata = table.schema.metadata or {}
+        if metadata.get(_SOURCE_VERSION_KEY) != _encode_version(version):
+            return None
+        return table.to_pandas()
+
+    def _save_cache(
+        self, path: Path, df: pd.DataFrame, metadata: dict[bytes, bytes] | None = None,
+    ) -> None:
+        # バックグラウンド更新中に読まれても壊れたファイルが見えないよう、置き換えで書く
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if metadata:
+            table = table.replace_schema_metadata({**table.schema.metadata, **metadata})
+        pq.write_table(table, tmp_path, compression=_parquet_compression())
+        os.replace(tmp_path, path)
 
     def _next_fetch_start(
-        self, cached_df: pd.DataFrame, original_start: date, cache_path: Path,
+        self, cached_df: pd.DataFrame, original_start: date, mtime: datetime,
     ) -> date:
         cache_start = cached_df["date"].min().date()
         if cache_start > original_start:
-            mtime = datetime.fromtimestamp(cache_path.stat().st_mtime)
             if (datetime.now() - mtime) < MIN_REFRESH_INTERVAL:
                 pass  # 最近取得済み → ソースに古いデータがない
             else:
@@ -262,10 +406,16 @@ class CachedSource:
     ) -> pd.DataFrame:
         if cached is None:
             return new.sort_values("date").reset_index(drop=True)
+        if new.empty:
+            return cached
+        # 通常の差分取得は新しい日付のみなので、重複除去とソートなしで末尾に足す
+        if new["date"].is_monotonic_increasing and new["date"].iloc[0] > cached["date"].iloc[-1]:
+            return pd.concat([cached, new], ignore_index=True)
         combined = pd.concat([cached, new], ignore_index=True)
         combined = combined.drop_duplicates(subset=["date"]).sort_values("date")
         return combined.reset_index(drop=True)
 
     def _filter(self, df: pd.DataFrame, start: date, end: date) -> pd.DataFrame:
-        mask = (df["date"].dt.date >= start) & (df["date"].dt.date <= end)
-        return df.loc[mask].reset_index(drop=True)
+        # キャッシュは日付順に保存しているので、二分探索で範囲を切り出す
+        lo, hi = df["date"].searchsorted([pd.Timestamp(start), pd.Timestamp(end + timedelta(days=1))])
+        return df.iloc[lo:hi].reset_index(drop=True)
@@ -9,7 +9,10 @@ from __future__ import annotations
 import logging
 import re
 import shutil
+import subprocess
+import threading
 from datetime import date
+from pathlib import Path
 from typing import TYPE_CHECKING
 
 import pandas as pd
@@ -23,6 +26,12 @@ _BASE_URL = "https://finance.yahoo.co.jp/quote/{code}/history"
 _MAX_PAGES = 100
 _NAV_WAIT_MS = 2000
 
+# 履歴の日付表記（例: 2024年1月5日）
+_JP_DATE_RE = re.compile(r"(\d{4})年(\d{1,2})月(\d{1,2})日")
+
+# テーブル各行のセル文字列をまとめて返す（行・セルごとのブラウザ往復を避ける）
+_TABLE_CELLS_JS = "rows => rows.map(r => Array.from(r.querySelectorAll('td'), td => td.textContent))"
+
 # システムにインストールされた Chromium を検出する
 _SYSTEM_CHROMIUM_NAMES = ("chromium", "chromium-browser", "google-chrome")
 
@@ -36,34 +45,66 @@ def _find_system_chromium() -> str | None:
     return None
 
 
+# ブラウザ起動はメモリを大きく使うため、並行取得でもスクレイピングは 1 件ずつ行う
+_BROWSER_LOCK = threading.Lock()
+
+
+def _ensure_bundled_chromium(executable_path: str) -> None:
+    """Playwright バンドル版 Chromium がなければ playwright install を実行する。
+
+    投資信託の取得時にだけ _BROWSER_LOCK を保持した状態で呼ばれる。
+    """
+    if Path(executable_path).exists():
+        return
+    logger.info("Installing Playwright Chromium browser...")
+    try:
+        subprocess.run(
+            ["playwright", "install", "chromium"],
+            check=True,
+            capture_output=True,
+            timeout=300,
+        )
+    except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired) as e:
+        logger.error("Failed to install Playwright Chromium: %s", e)
+
+
+def _latest_json(responses: list[Response]) -> dict | None:
+    """キャプチャしたレスポンスのうち、JSON として読める最後のものを返す。"""
+    for response in reversed(responses):
+        try:
+            return response.json()
+        except Exception:
+            logger.debug("Failed to parse BFF response from %s", response.url)
+    return None
+
+
 class YahooJPSource:
     """日本の投資信託データのスクレイピング (Yahoo!ファイナンスJP)。"""
 
     def fetch(self, code: str, start: date, end: date) -> pd.DataFrame:
         from playwright.sync_api import sync_playwright
 
-        all_rows: list[dict[str, object]] = []
+        all_rows: list[tuple[date, float]] = []
 
-        with sync_playwright() as pw:
+        with _BROWSER_LOCK, sync_playwright() as pw:
             launch_kwargs: dict[str, object] = {"headless": True}
             sys_chromium = _find_system_chromium()
             if sys_chromium:
                 launch_kwargs["executable_path"] = sys_chromium
                 logger.info("Using system Chromium: %s", sys_chromium)
+            else:
+                _ensure_bundled_chromium(pw.chromium.executable_path)
             browser = pw.chromium.launch(**launch_kwargs)
             try:
                 page = browser.new_page()
 
-                # BFF API レスポンスをキャプチャ
-                captured: list[dict] = []
+                # BFF API レスポンスをキャプチャ（JSON のパースは使う分だけ後で行う）
+                captured: list[Response] = []
 
                 def _on_response(response: Response) -> None:
                     url = response.url
-                    if "/bff/" in url and "/history" in url:
-                        try:
-                            captured.append(response.json())
-                        except Exception:
-                            logger.debug("Failed to parse BFF response from %s", url)
+                    if response.ok and "/bff/" in url and "/history" in url:
+                        captured.append(response)
 
                 page.on("response", _on_response)
 
@@ -92,18 +133,19 @@ class YahooJPSource:
                     page.wait_for_timeout(500)
 
                     # BFF API レスポンスからデータ抽出
-                    if captured:
-                        new_rows = self._parse_bff_response(captured[-1])
+                    body = _latest_json(captured)
+                    if body is not None:
+                        new_rows = self._parse_bff_response(body)
                         if not new_rows:
                             break
                         all_rows.extend(new_rows)
 
                         # start 日より前のデータが出たら終了
-                        earliest = min(r["date"] for r in new_rows)
-                        if pd.Timestamp(earliest).date() <= start:
+                        earliest = min(d for d, _ in new_rows)
+                        if earliest <= start:
                             break
 
-                        paging = captured[-1].get("paging", {})
+                        paging = body.get("paging", {})
                         if not paging.get("hasNext", False):
                             break
                     else:
@@ -118,7 +160,8 @@ class YahooJPSource:
         if not all_rows:
             raise ValueError(f"No data scraped from Yahoo JP for {code}")
 
-        df = pd.DataFrame(all_rows)
+        # 行は (日付, 基準価額) のタプルで集め、DataFrame 化と日付変換は最後に 1 回だけ行う
+        df = pd.DataFrame(all_rows, columns=["date", "close"])
         df["date"] = pd.to_datetime(df["date"])
         df = df.drop_duplicates(subset=["date"]).sort_values("date").reset_index(drop=True)
 
@@ -129,34 +172,33 @@ class YahooJPSource:
             raise ValueError(f"No data in range for {code}")
         return result
 
-    def _extract_table(self, page: Page) -> list[dict[str, object]]:
+    def _extract_table(self, page: Page) -> list[tuple[date, float]]:
         """HTMLテーブルから日付と基準価額を抽出する。"""
-        rows = page.locator("table tbody tr").all()
-        data: list[dict[str, object]] = []
-        for row in rows:
-            cells = row.locator("td").all()
+        rows: list[list[str]] = page.locator("table tbody tr").evaluate_all(_TABLE_CELLS_JS)
+        data: list[tuple[date, float]] = []
+        for cells in rows:
             if len(cells) < 2:
                 continue
-            date_text = cells[0].text_content().strip()
-            price_text = cells[1].text_content().strip()
-            m = re.match(r"(\d{4})年(\d{1,2})月(\d{1,2})日", date_text)
+            date_text = cells[0].strip()
+            price_text = cells[1].strip()
+            m = _JP_DATE_RE.match(date_text)
             if m:
                 d = date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
                 try:
                     close = float(price_text.replace(",", ""))
                 except ValueError:
                     continue
-                data.append({"date": pd.Timestamp(d), "close": close})
+                data.append((d, close))
         return data
 
-    def _parse_bff_response(self, body: dict) -> list[dict[str, object]]:
+    def _parse_bff_response(self, body: dict) -> list[tuple[date, float]]:
         """BFF API のレスポンスから基準価額データを抽出する。"""
         histories = body.get("histories", [])
-        data: list[dict[str, object]] = []
+        data: list[tuple[date, float]] = []
         for entry in histories:
             try:
                 date_str = entry.get("date", "")
-                m = re.match(r"(\d{4})年(\d{1,2})月(\d{1,2})日", date_str)
+                m = _JP_DATE_RE.match(date_str)
                 if not m:
                     continue
                 d = date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
@@ -164,7 +206,7 @@ class YahooJPSource:
                 if price is None:
                     continue
                 close = float(str(price).replace(",", ""))
-                data.append({"date": pd.Timestamp(d), "close": close})
+                data.append((d, close))
             except (ValueError, TypeError):
                 continue
         return data
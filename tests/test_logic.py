@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
 import pytest
@@ -9,8 +11,18 @@ from dip_catcher.logic import (
     BollingerBands,
     DrawdownEvent,
     IndicatorScores,
+    _ewm_values,
+    _label_from_score,
+    _score_bollinger,
+    _score_drawdown,
+    _score_ma_deviation,
+    _score_rarity,
+    _score_rsi,
     analyze,
+    bollinger_values,
+    calc_best_rarity,
     calc_bollinger_bands,
+    calc_cumulative_returns,
     calc_daily_returns,
     calc_drawdown,
     calc_ma_deviation,
@@ -18,41 +30,69 @@ from dip_catcher.logic import (
     calc_return_percentile,
     calc_rsi,
     find_drawdown_events,
+    latest_indicator_values,
+    lttb_indices,
+    ma_deviation_values,
+    pct_change_values,
+    rolling_mean_std_values,
+    rsi_values,
 )
 from dip_catcher.models import AnalysisConfig, PriceHistory
 
 
-def _make_closes(values: list[float]) -> tuple[pd.Series, pd.Series]:
+@lru_cache(maxsize=None)
+def _bdays(periods: int) -> pd.DatetimeIndex:
+    """2024-01-01 から始まる営業日の列。長さごとに一度だけ生成する（不変なので共有してよい）。"""
+    return pd.date_range("2024-01-01", periods=periods, freq="B")
+
+
+def _make_closes(values: list[float] | np.ndarray) -> tuple[pd.Series, pd.Series]:
     """テスト用の closes と dates を生成する。"""
-    dates = pd.date_range("2024-01-01", periods=len(values), freq="B")
-    return pd.Series(values, dtype=float), pd.Series(dates)
+    return pd.Series(values, dtype=float), pd.Series(_bdays(len(values)))
 
 
-def _make_history(values: list[float]) -> PriceHistory:
+def _make_history(values: list[float] | np.ndarray) -> PriceHistory:
     """テスト用の PriceHistory を生成する。"""
-    dates = pd.date_range("2024-01-01", periods=len(values), freq="B")
-    df = pd.DataFrame({"date": dates, "close": values})
+    closes = np.asarray(values, dtype=np.float64)
+    df = pd.DataFrame({"date": _bdays(len(closes)), "close": closes}, copy=False)
     return PriceHistory(df)
 
 
-class TestCalcDrawdown:
-    def test_no_drawdown_when_monotonic_increase(self) -> None:
-        closes, _ = _make_closes([100, 110, 120, 130])
-        dd = calc_drawdown(closes)
-        assert (dd == 0).all()
+def _readonly(values: np.ndarray) -> np.ndarray:
+    """テスト間で共有する配列を書き込み不可にする。"""
+    values.setflags(write=False)
+    return values
 
-    def test_drawdown_after_peak(self) -> None:
-        closes, _ = _make_closes([100, 200, 180, 160])
-        dd = calc_drawdown(closes)
-        # 200 → 180 = -10%, 200 → 160 = -20%
-        assert dd.iloc[2] == pytest.approx(-0.10)
-        assert dd.iloc[3] == pytest.approx(-0.20)
 
-    def test_drawdown_recovery(self) -> None:
-        closes, _ = _make_closes([100, 200, 150, 200])
-        dd = calc_drawdown(closes)
-        assert dd.iloc[2] == pytest.approx(-0.25)
-        assert dd.iloc[3] == pytest.approx(0.0)
+# 単調な上昇・下落系列
+_UP_30 = _readonly(np.arange(100.0, 130.0))
+_DOWN_30 = _readonly(np.arange(130.0, 100.0, -1))
+_UP_100 = _readonly(np.arange(100.0, 200.0))
+_DOWN_100 = _readonly(np.arange(200.0, 100.0, -1))
+
+
+@pytest.fixture(scope="module")
+def random_walk() -> np.ndarray:
+    """乱数ウォークの終値 200 点。短い系列が必要なテストは先頭をスライスして使う。"""
+    rng = np.random.default_rng(42)
+    return 100 + np.cumsum(rng.standard_normal(200))
+
+
+class TestCalcDrawdown:
+    @pytest.mark.parametrize(
+        ("values", "expected"),
+        [
+            # 単調増加ならドローダウンなし
+            ([100, 110, 120, 130], [0.0, 0.0, 0.0, 0.0]),
+            # 200 → 180 = -10%, 200 → 160 = -20%
+            ([100, 200, 180, 160], [0.0, 0.0, -0.10, -0.20]),
+            # 高値を回復すれば 0 に戻る
+            ([100, 200, 150, 200], [0.0, 0.0, -0.25, 0.0]),
+        ],
+    )
+    def test_drawdown(self, values: list[float], expected: list[float]) -> None:
+        closes, _ = _make_closes(values)
+        assert calc_drawdown(closes).tolist() == pytest.approx(expected)
 
 
 class TestCalcRecentPeak:
@@ -115,6 +155,22 @@ class TestCalcReturnPercentile:
         assert pct == 50.0
 
 
+class TestCalcBestRarity:
+    def test_matches_series_percentile(self, random_walk: np.ndarray) -> None:
+        closes, _ = _make_closes(random_walk)
+        pct, ret, window = calc_best_rarity(closes)
+        rets = calc_cumulative_returns(closes, window)
+        assert ret == pytest.approx(rets.iloc[-1])
+        assert pct == pytest.approx(calc_return_percentile(rets, ret))
+
+    def test_sharp_last_day_drop_is_rarest(self) -> None:
+        closes, _ = _make_closes([100.0 + (i % 2) for i in range(50)] + [80.0])
+        pct, ret, window = calc_best_rarity(closes)
+        assert window == 1
+        assert ret == pytest.approx(80.0 / 101.0 - 1)
+        assert pct == pytest.approx(100 / 50)
+
+
 class TestCalcMADeviation:
     def test_no_deviation_at_flat_price(self) -> None:
         closes, _ = _make_closes([100.0] * 20)
@@ -140,21 +196,19 @@ class TestCalcMADeviation:
 
 class TestCalcRSI:
     def test_rsi_at_100_for_all_gains(self) -> None:
-        closes, _ = _make_closes(list(range(100, 130)))
+        closes, _ = _make_closes(_UP_30)
         rsi = calc_rsi(closes, period=14)
         # 全て上昇なのでRSIは100に近い
         assert rsi.iloc[-1] > 95
 
     def test_rsi_near_0_for_all_losses(self) -> None:
-        closes, _ = _make_closes(list(range(130, 100, -1)))
+        closes, _ = _make_closes(_DOWN_30)
         rsi = calc_rsi(closes, period=14)
         # 全て下落なのでRSIは0に近い
         assert rsi.iloc[-1] < 5
 
-    def test_rsi_range(self) -> None:
-        np.random.seed(42)
-        values = (100 + np.cumsum(np.random.randn(100))).tolist()
-        closes, _ = _make_closes(values)
+    def test_rsi_range(self, random_walk: np.ndarray) -> None:
+        closes, _ = _make_closes(random_walk[:100])
         rsi = calc_rsi(closes, period=14)
         valid = rsi.dropna()
         assert (valid >= 0).all()
@@ -166,99 +220,206 @@ class TestCalcBollingerBands:
         closes, _ = _make_closes([100.0] * 30)
         bb = calc_bollinger_bands(closes, period=20, num_std=2.0)
         # 定数価格ではstd=0, upper=lower=middle=100
-        assert bb.middle.iloc[-1] == pytest.approx(100.0)
-        assert bb.upper.iloc[-1] == pytest.approx(100.0)
-        assert bb.lower.iloc[-1] == pytest.approx(100.0)
+        assert [bb.middle.iloc[-1], bb.upper.iloc[-1], bb.lower.iloc[-1]] == pytest.approx([100.0] * 3)
 
-    def test_percent_b_at_middle(self) -> None:
-        np.random.seed(42)
-        values = (100 + np.cumsum(np.random.randn(50) * 0.5)).tolist()
-        closes, _ = _make_closes(values)
+    def test_percent_b_at_middle(self, random_walk: np.ndarray) -> None:
+        closes, _ = _make_closes(random_walk[:50])
         bb = calc_bollinger_bands(closes, period=20, num_std=2.0)
         # %Bは概ね0〜1の範囲
         valid = bb.percent_b.dropna()
         assert len(valid) > 0
 
 
-class TestFindDrawdownEvents:
-    def test_single_drawdown_with_recovery(self) -> None:
-        # 100 → 200 → 180 → 160 → 200
-        closes, dates = _make_closes([100, 200, 180, 160, 200])
-        events = find_drawdown_events(dates, closes, threshold=-0.05)
-        assert len(events) == 1
-        assert events[0].max_drawdown == pytest.approx(-0.20)
-        assert events[0].recovery_date is not None
+class TestRollingMeanStd:
+    def test_matches_pandas_rolling_at_high_price_level(self) -> None:
+        rng = np.random.default_rng(2)
+        values = 1e6 + np.cumsum(rng.standard_normal(1000))
+        values[500] = np.nan
+        mean, std = rolling_mean_std_values(values, 20)
+        rolling = pd.Series(values).rolling(20)
+        assert np.allclose(mean, rolling.mean().to_numpy(), rtol=1e-12, equal_nan=True)
+        assert np.allclose(std, rolling.std().to_numpy(), rtol=1e-6, equal_nan=True)
+
+    def test_matches_pandas_rolling_on_long_uptrend(self) -> None:
+        # 基準値（先頭値）から大きく離れても二乗和の桁落ちが出ないこと
+        rng = np.random.default_rng(3)
+        values = 100 * np.exp(np.cumsum(rng.standard_normal(5000) * 0.01 + 0.0012))
+        _, std = rolling_mean_std_values(values, 20)
+        expected = pd.Series(values).rolling(20).std().to_numpy()
+        assert np.allclose(std, expected, rtol=1e-8, equal_nan=True)
+
+
+class TestEwmValues:
+    @pytest.mark.filterwarnings("error")
+    def test_matches_pandas_on_large_values_across_blocks(self) -> None:
+        # alpha=1/14 の 1 ブロック（約 4600 点）を超える長さで、1e10 台の値でも溢れないこと
+        rng = np.random.default_rng(4)
+        values = 1e10 + np.cumsum(rng.standard_normal(12000)) * 1e8
+        expected = pd.Series(values).ewm(alpha=1 / 14, adjust=False).mean().to_numpy()
+        assert np.allclose(_ewm_values(values, 1 / 14), expected, rtol=1e-10)
+
+
+class TestFloat32Kernels:
+    def test_float32_matches_float64(self) -> None:
+        rng = np.random.default_rng(0)
+        values = 20000 + np.cumsum(rng.standard_normal(500) * 200)
+        values32 = values.astype(np.float32)
+        for kernel, arg in ((rsi_values, 14), (ma_deviation_values, 25), (pct_change_values, 5)):
+            out64 = kernel(values, arg)
+            out32 = kernel(values32, arg)
+            assert out32.dtype == np.float32
+            assert np.allclose(out64, out32, rtol=1e-5, atol=1e-6, equal_nan=True)
+        # %B は 0 付近で相対誤差が大きくなるため絶対誤差で比較する
+        for out64, out32 in zip(bollinger_values(values, 20, 2.0), bollinger_values(values32, 20, 2.0)):
+            assert np.allclose(out64, out32, rtol=1e-5, atol=1e-5, equal_nan=True)
+
+
+class TestLatestIndicatorValues:
+    def test_matches_series_tail(self) -> None:
+        rng = np.random.default_rng(1)
+        values = 100 + np.cumsum(rng.standard_normal(300))
+        closes = pd.Series(values)
+        dd, daily_ret, ma_dev, rsi, percent_b = latest_indicator_values(values, 75, 14, 20, 2.0)
+        assert dd == pytest.approx(calc_drawdown(closes).iloc[-1])
+        assert daily_ret == pytest.approx(calc_daily_returns(closes).iloc[-1])
+        assert ma_dev == pytest.approx(calc_ma_deviation(closes, 75).iloc[-1])
+        assert rsi == pytest.approx(calc_rsi(closes, 14).iloc[-1])
+        assert percent_b == pytest.approx(calc_bollinger_bands(closes, 20, 2.0).percent_b.iloc[-1])
+
+    def test_short_series_returns_nan(self) -> None:
+        _, _, ma_dev, rsi, percent_b = latest_indicator_values(np.array([100.0, 101.0]), 75, 14, 20, 2.0)
+        assert np.isnan(ma_dev) and np.isnan(rsi) and np.isnan(percent_b)
+
+    def test_rsi_on_long_one_sided_series(self) -> None:
+        # 下落ゼロなら RSI は 100、長い系列でも古い重みのアンダーフローで崩れない
+        values = np.linspace(100.0, 200.0, 5000)
+        assert latest_indicator_values(values, 75, 14, 20, 2.0)[3] == pytest.approx(100.0)
+        assert latest_indicator_values(values[::-1].copy(), 75, 14, 20, 2.0)[3] == pytest.approx(0.0)
+
+
+class TestLTTBIndices:
+    def test_short_series_is_untouched(self) -> None:
+        assert lttb_indices(np.arange(10.0), 20).tolist() == list(range(10))
+
+    def test_keeps_endpoints_and_spike(self) -> None:
+        values = np.zeros(2000)
+        values[1234] = 50.0
+        idx = lttb_indices(values, 100)
+        assert len(idx) == 100
+        assert idx[0] == 0 and idx[-1] == 1999
+        assert (np.diff(idx) > 0).all()
+        assert 1234 in idx
+
+    def test_skips_leading_nan(self) -> None:
+        values = np.concatenate([np.full(14, np.nan), np.zeros(2000)])
+        values[14 + 1234] = 50.0
+        idx = lttb_indices(values, 100)
+        assert len(idx) == 100
+        assert idx[0] == 14 and idx[-1] == len(values) - 1
+        assert not np.isnan(values[idx]).any()
+        assert 14 + 1234 in idx
 
-    def test_no_drawdown_in_uptrend(self) -> None:
-        closes, dates = _make_closes([100, 110, 120, 130, 140])
+
+class TestFindDrawdownEvents:
+    @pytest.mark.parametrize(
+        ("values", "max_drawdowns", "recovered"),
+        [
+            # 100 → 200 → 180 → 160 → 200
+            ([100, 200, 180, 160, 200], [-0.20], [True]),
+            # 上昇トレンドではイベントなし
+            ([100, 110, 120, 130, 140], [], []),
+            # 200 → 140 のまま未回復
+            ([100, 200, 150, 140], [-0.30], [False]),
+        ],
+    )
+    def test_events(self, values: list[float], max_drawdowns: list[float], recovered: list[bool]) -> None:
+        closes, dates = _make_closes(values)
         events = find_drawdown_events(dates, closes, threshold=-0.05)
-        assert len(events) == 0
+        assert [e.max_drawdown for e in events] == pytest.approx(max_drawdowns)
+        assert [e.recovery_date is not None for e in events] == recovered
+        assert [e.recovery_days is not None for e in events] == recovered
 
-    def test_unrecovered_drawdown(self) -> None:
-        closes, dates = _make_closes([100, 200, 150, 140])
+    def test_multiple_events_skip_nan(self) -> None:
+        # 1 回目: 200 → 150（最安値は最初の 150）→ 210 で回復、2 回目: 210 → 180 のまま未回復
+        closes, dates = _make_closes([100, 200, 150, float("nan"), 150, 190, 210, 180, 185])
         events = find_drawdown_events(dates, closes, threshold=-0.05)
-        assert len(events) == 1
-        assert events[0].recovery_date is None
-        assert events[0].recovery_days is None
+        assert len(events) == 2
+        assert events[0].peak_date == dates[1]
+        assert events[0].trough_date == dates[2]
+        assert events[0].recovery_date == dates[6]
+        assert events[0].recovery_days == (dates[6] - dates[2]).days
+        assert events[1].peak_date == dates[6]
+        assert events[1].max_drawdown == pytest.approx(180 / 210 - 1)
+        assert events[1].recovery_date is None
+
+    def test_accepts_ndarrays(self) -> None:
+        closes, dates = _make_closes([100, 200, 150, 210, 180, 230, 190])
+        from_series = find_drawdown_events(dates, closes, threshold=-0.05)
+        from_arrays = find_drawdown_events(dates.to_numpy(), closes.to_numpy(), threshold=-0.05)
+        assert from_arrays == from_series
+        assert calc_best_rarity(closes.to_numpy()) == calc_best_rarity(closes)
 
 
 class TestScoring:
-    def test_score_deep_drawdown(self) -> None:
-        from dip_catcher.logic import _score_drawdown
-
-        assert _score_drawdown(0.0) == 0.0
-        assert _score_drawdown(-0.30) == pytest.approx(100.0)
-        assert _score_drawdown(-0.15) == pytest.approx(50.0)
-
-    def test_score_rarity(self) -> None:
-        from dip_catcher.logic import _score_rarity
-
-        # window=1: パニック渦中 (×0.85)
-        assert _score_rarity(20.0, window=1) == 0.0
-        assert _score_rarity(0.0, window=1) == pytest.approx(85.0)
-        assert _score_rarity(10.0, window=1) == pytest.approx(42.5)
-        # window=3: 安定化パターン (×1.15)
-        assert _score_rarity(20.0, window=3) == 0.0
-        assert _score_rarity(0.0, window=3) == pytest.approx(100.0)  # capped
-        assert _score_rarity(10.0, window=3) == pytest.approx(57.5)
-
-    def test_score_rsi(self) -> None:
-        from dip_catcher.logic import _score_rsi
-
-        assert _score_rsi(70.0) == 0.0
-        assert _score_rsi(20.0) == pytest.approx(100.0)
-        assert _score_rsi(45.0) == pytest.approx(50.0)
-
-    def test_score_ma_deviation(self) -> None:
-        from dip_catcher.logic import _score_ma_deviation
-
-        assert _score_ma_deviation(0.0) == 0.0
-        assert _score_ma_deviation(0.05) == 0.0  # プラス方向はスコアなし
-        assert _score_ma_deviation(-0.10) == pytest.approx(100.0)
-        assert _score_ma_deviation(-0.05) == pytest.approx(50.0)
-
-    def test_score_bollinger(self) -> None:
-        from dip_catcher.logic import _score_bollinger
-
-        assert _score_bollinger(1.0) == 0.0
-        assert _score_bollinger(-0.5) == pytest.approx(100.0)
-        # (1.0 - 0.25) / (1.0 - (-0.5)) * 100 = 0.75 / 1.5 * 100 = 50
-        assert _score_bollinger(0.25) == pytest.approx(50.0)
-
-    def test_label_from_score(self) -> None:
-        from dip_catcher.logic import _label_from_score
-
-        assert _label_from_score(90) == "強い買い場"
-        assert _label_from_score(70) == "買い場検討"
-        assert _label_from_score(50) == "様子見"
-        assert _label_from_score(30) == "待機"
+    @pytest.mark.parametrize(("drawdown", "expected"), [(0.0, 0.0), (-0.30, 100.0), (-0.15, 50.0)])
+    def test_score_deep_drawdown(self, drawdown: float, expected: float) -> None:
+        assert _score_drawdown(drawdown) == pytest.approx(expected)
+
+    @pytest.mark.parametrize(
+        ("percentile", "window", "expected"),
+        [
+            # window=1: パニック渦中 (×0.85)
+            (20.0, 1, 0.0),
+            (0.0, 1, 85.0),
+            (10.0, 1, 42.5),
+            # window=3: 安定化パターン (×1.15)
+            (20.0, 3, 0.0),
+            (0.0, 3, 100.0),  # capped
+            (10.0, 3, 57.5),
+        ],
+    )
+    def test_score_rarity(self, percentile: float, window: int, expected: float) -> None:
+        assert _score_rarity(percentile, window=window) == pytest.approx(expected)
+
+    @pytest.mark.parametrize(("rsi", "expected"), [(70.0, 0.0), (20.0, 100.0), (45.0, 50.0)])
+    def test_score_rsi(self, rsi: float, expected: float) -> None:
+        assert _score_rsi(rsi) == pytest.approx(expected)
+
+    @pytest.mark.parametrize(
+        ("deviation", "expected"),
+        [
+            (0.0, 0.0),
+            (0.05, 0.0),  # プラス方向はスコアなし
+            (-0.10, 100.0),
+            (-0.05, 50.0),
+        ],
+    )
+    def test_score_ma_deviation(self, deviation: float, expected: float) -> None:
+        assert _score_ma_deviation(deviation) == pytest.approx(expected)
+
+    @pytest.mark.parametrize(
+        ("percent_b", "expected"),
+        [
+            (1.0, 0.0),
+            (-0.5, 100.0),
+            # (1.0 - 0.25) / (1.0 - (-0.5)) * 100 = 0.75 / 1.5 * 100 = 50
+            (0.25, 50.0),
+        ],
+    )
+    def test_score_bollinger(self, percent_b: float, expected: float) -> None:
+        assert _score_bollinger(percent_b) == pytest.approx(expected)
+
+    @pytest.mark.parametrize(
+        ("score", "label"),
+        [(90, "強い買い場"), (70, "買い場検討"), (50, "様子見"), (30, "待機")],
+    )
+    def test_label_from_score(self, score: float, label: str) -> None:
+        assert _label_from_score(score) == label
 
 
 class TestAnalyze:
-    def test_analyze_returns_valid_result(self) -> None:
-        np.random.seed(42)
-        values = (100 + np.cumsum(np.random.randn(200))).tolist()
-        history = _make_history(values)
+    def test_analyze_returns_valid_result(self, random_walk: np.ndarray) -> None:
+        history = _make_history(random_walk)
         config = AnalysisConfig()
 
         result = analyze(history, config)
@@ -270,23 +431,23 @@ class TestAnalyze:
         assert result.return_percentile >= 0
 
     def test_analyze_bearish_market(self) -> None:
-        values = list(range(200, 100, -1))
-        history = _make_history(values)
+        history = _make_history(_DOWN_100)
         config = AnalysisConfig()
 
         result = analyze(history, config)
 
         assert result.current_drawdown < 0
+        assert result.recent_drawdown == pytest.approx(result.current_drawdown)
         assert result.scores.drawdown > 0
         assert result.scores.rsi > 50
 
     def test_analyze_bullish_market(self) -> None:
-        values = list(range(100, 200))
-        history = _make_history(values)
+        history = _make_history(_UP_100)
         config = AnalysisConfig()
 
         result = analyze(history, config)
 
         assert result.current_drawdown == pytest.approx(0.0)
+        assert result.recent_drawdown == pytest.approx(0.0)
         assert result.scores.drawdown == 0.0
         assert result.total_score < 30
@@ -1,19 +1,32 @@
 from __future__ import annotations
 
-from datetime import date
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import pytest
+from pydantic import ValidationError
 
-from dip_catcher.models import AssetCategory, PriceHistory
+from dip_catcher.models import AssetCategory, PriceHistory, WatchlistItem
 from dip_catcher.sources import get_source
 from dip_catcher.sources.cache import CachedSource, FetchResult
+from dip_catcher.sources.yahoo_jp import YahooJPSource, _latest_json
+
+
+@lru_cache(maxsize=None)
+def _bdays(start: str, periods: int) -> pd.DatetimeIndex:
+    """営業日の列。開始日と長さごとに一度だけ生成する（不変なので共有してよい）。"""
+    return pd.date_range(start, periods=periods, freq="B")
 
 
 def _make_df(start: str, periods: int) -> pd.DataFrame:
     """テスト用の価格DataFrameを生成する。"""
-    dates = pd.date_range(start, periods=periods, freq="B")
+    dates = _bdays(start, periods)
     closes = [100.0 + i for i in range(periods)]
     return pd.DataFrame({"date": dates, "close": closes})
 
@@ -27,8 +40,44 @@ class FakeSource:
 
     def fetch(self, code: str, start: date, end: date) -> pd.DataFrame:
         self.call_count += 1
-        mask = (self._df["date"].dt.date >= start) & (self._df["date"].dt.date <= end)
-        return self._df.loc[mask].reset_index(drop=True)
+        # _make_df は日付順なので、CachedSource._filter と同じく二分探索で切り出す
+        lo, hi = self._df["date"].searchsorted([pd.Timestamp(start), pd.Timestamp(end + timedelta(days=1))])
+        return self._df.iloc[lo:hi].reset_index(drop=True)
+
+
+class SlowSource(FakeSource):
+    """取得に時間がかかるダミーデータソース。"""
+
+    def fetch(self, code: str, start: date, end: date) -> pd.DataFrame:
+        time.sleep(0.1)
+        return super().fetch(code, start, end)
+
+
+class FakeTablePage:
+    """テーブル行のセル文字列を返すだけのダミー Page。"""
+
+    def __init__(self, rows: list[list[str]]) -> None:
+        self._rows = rows
+
+    def locator(self, selector: str) -> FakeTablePage:
+        return self
+
+    def evaluate_all(self, expression: str) -> list[list[str]]:
+        return self._rows
+
+
+class FakeResponse:
+    """json() の結果だけを持つダミー Response。"""
+
+    url = "https://finance.yahoo.co.jp/bff/history"
+
+    def __init__(self, body: dict | None) -> None:
+        self._body = body
+
+    def json(self) -> dict:
+        if self._body is None:
+            raise ValueError("not json")
+        return self._body
 
 
 class FailingSource:
@@ -49,7 +98,7 @@ class TestCachedSource:
         assert isinstance(result, FetchResult)
         assert not result.is_fallback
         assert len(result.df) == 10
-        assert (tmp_path / "TEST.csv").exists()
+        assert (tmp_path / "TEST.parquet").exists()
         assert fake.call_count == 1
 
     def test_second_fetch_uses_cache_delta(self, tmp_path: Path) -> None:
@@ -89,7 +138,7 @@ class TestCachedSource:
         source = CachedSource(fake, data_dir=tmp_path)
 
         source.fetch("^NKX", date(2024, 1, 1), date(2024, 1, 31))
-        assert (tmp_path / "_NKX.csv").exists()
+        assert (tmp_path / "_NKX.parquet").exists()
 
     def test_cache_path_prevents_traversal(self, tmp_path: Path) -> None:
         df = _make_df("2024-01-01", 3)
@@ -97,10 +146,159 @@ class TestCachedSource:
         source = CachedSource(fake, data_dir=tmp_path)
 
         source.fetch("../../etc/passwd", date(2024, 1, 1), date(2024, 1, 31))
-        cached_files = list(tmp_path.glob("*.csv"))
+        cached_files = list(tmp_path.glob("*.parquet"))
         assert len(cached_files) == 1
         assert cached_files[0].parent == tmp_path
 
+    def test_save_leaves_no_temp_files(self, tmp_path: Path) -> None:
+        source = CachedSource(FakeSource(_make_df("2024-01-01", 5)), data_dir=tmp_path)
+        source.fetch("TEST", date(2024, 1, 1), date(2024, 1, 31))
+        assert not list(tmp_path.glob("*.tmp"))
+
+    def test_cache_version(self, tmp_path: Path) -> None:
+        source = CachedSource(FakeSource(_make_df("2024-01-01", 5)), data_dir=tmp_path)
+        assert source.cache_version("TEST") is None
+        source.fetch("TEST", date(2024, 1, 1), date(2024, 1, 31))
+        stat = (tmp_path / "TEST.parquet").stat()
+        assert source.cache_version("TEST") == (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def test_concurrent_fetches_of_same_code_hit_source_once(self, tmp_path: Path) -> None:
+        fake = SlowSource(_make_df("2024-01-01", 23))  # 2024-01 の営業日すべて
+        source = CachedSource(fake, data_dir=tmp_path)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [
+                executor.submit(source.fetch, "TEST", date(2024, 1, 1), date(2024, 1, 31))
+                for _ in range(2)
+            ]
+            results = [f.result() for f in futures]
+
+        assert fake.call_count == 1
+        assert [len(r.df) for r in results] == [23, 23]
+
+    def test_cache_is_read_once_until_file_changes(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        df = _make_df("2024-01-01", 30)
+        source = CachedSource(FakeSource(df), data_dir=tmp_path)
+        source.fetch("TEST", date(2024, 1, 1), date(2024, 1, 14))
+        reads: list[Path] = []
+        read_parquet = pd.read_parquet
+
+        def counting_read(path: Path, **kwargs: object) -> pd.DataFrame:
+            reads.append(path)
+            return read_parquet(path, **kwargs)
+
+        monkeypatch.setattr(pd, "read_parquet", counting_read)
+
+        source.load_cache("TEST", date(2024, 1, 1), date(2024, 1, 31))
+        first = source.load_cache("TEST", date(2024, 1, 1), date(2024, 1, 31))
+        assert len(reads) == 1
+
+        source.fetch("TEST", date(2024, 1, 1), date(2024, 1, 31))
+        second = source.load_cache("TEST", date(2024, 1, 1), date(2024, 1, 31))
+        assert first is not None and second is not None
+        assert len(second.df) > len(first.df)
+
+    def test_rewrite_within_same_mtime_is_reloaded(self, tmp_path: Path) -> None:
+        # mtime の分解能が粗いファイルシステムで、同じ刻みに書き換えられた場合
+        source = CachedSource(FakeSource(_make_df("2024-01-01", 5)), data_dir=tmp_path)
+        source.fetch("TEST", date(2024, 1, 1), date(2024, 1, 31))
+        path = tmp_path / "TEST.parquet"
+        before = path.stat()
+        assert source.load_cache("TEST", date(2024, 1, 1), date(2024, 1, 31)) is not None
+
+        _make_df("2024-01-01", 10).to_parquet(path, index=False)
+        os.utime(path, ns=(before.st_atime_ns, before.st_mtime_ns))
+        result = source.load_cache("TEST", date(2024, 1, 1), date(2024, 1, 31))
+
+        assert result is not None
+        assert len(result.df) == 10
+
+    def test_needs_refresh_missing_and_fresh_cache(self, tmp_path: Path) -> None:
+        source = CachedSource(FakeSource(_make_df("2024-01-01", 5)), data_dir=tmp_path)
+        assert source.needs_refresh("TEST")
+        source.fetch("TEST", date(2024, 1, 1), date(2024, 1, 31))
+        assert not source.needs_refresh("TEST")
+
+    def test_legacy_csv_is_migrated(self, tmp_path: Path) -> None:
+        df = _make_df("2024-01-01", 5)
+        df.to_csv(tmp_path / "TEST.csv", index=False)
+        source = CachedSource(FailingSource(), data_dir=tmp_path)
+
+        result = source.load_cache("TEST", date(2024, 1, 1), date(2024, 1, 31))
+
+        assert result is not None
+        assert len(result.df) == 5
+        assert (tmp_path / "TEST.parquet").exists()
+        assert not (tmp_path / "TEST.csv").exists()
+
+    def test_concurrent_legacy_csv_migration(self, tmp_path: Path) -> None:
+        # 別セッション相当の 2 インスタンスから同時に移行しても例外にならない
+        _make_df("2024-01-01", 5).to_csv(tmp_path / "TEST.csv", index=False)
+        sources = [CachedSource(FailingSource(), data_dir=tmp_path) for _ in range(2)]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [
+                executor.submit(source.load_cache, "TEST", date(2024, 1, 1), date(2024, 1, 31))
+                for source in sources
+                for _ in range(4)
+            ]
+            results = [f.result() for f in futures]
+
+        assert all(r is not None and len(r.df) == 5 for r in results)
+        assert not (tmp_path / "TEST.csv").exists()
+
+    def test_monthly_closes_are_persisted(self, tmp_path: Path) -> None:
+        df = _make_df("2024-01-01", 60)
+        source = CachedSource(FakeSource(df), data_dir=tmp_path)
+        source.fetch("TEST", date(2024, 1, 1), date(2024, 3, 31))
+
+        monthly = source.load_monthly_closes("TEST", date(2024, 2, 10), date(2024, 3, 31))
+
+        assert monthly is not None
+        assert monthly.index.strftime("%Y-%m").tolist() == ["2024-02", "2024-03"]
+        assert monthly.iloc[0] == df.loc[df["date"].dt.month == 2, "close"].iloc[-1]
+        assert (tmp_path / "monthly" / "TEST.parquet").exists()
+
+    def test_monthly_closes_follow_daily_cache_rewrites(self, tmp_path: Path) -> None:
+        df = _make_df("2024-01-01", 60)
+        source = CachedSource(FakeSource(df), data_dir=tmp_path)
+        source.fetch("TEST", date(2024, 1, 1), date(2024, 3, 31))
+        daily_path = tmp_path / "TEST.parquet"
+        monthly_path = tmp_path / "monthly" / "TEST.parquet"
+        assert source.load_monthly_closes("TEST", date(2024, 3, 1), date(2024, 3, 31)).iloc[-1] == 159.0
+
+        # 日次キャッシュがより新しい mtime で書き換えられた場合
+        df.loc[59, "close"] = 200.0
+        df.to_parquet(daily_path, index=False)
+        newer = monthly_path.stat().st_mtime + 60
+        os.utime(daily_path, (newer, newer))
+        assert source.load_monthly_closes("TEST", date(2024, 3, 1), date(2024, 3, 31)).iloc[-1] == 200.0
+
+        # 集計の読み込み後に日次が書き換えられ、月次ファイルの mtime の方が新しくなった場合
+        df.loc[59, "close"] = 300.0
+        df.to_parquet(daily_path, index=False)
+        older = monthly_path.stat().st_mtime - 60
+        os.utime(daily_path, (older, older))
+        assert source.load_monthly_closes("TEST", date(2024, 3, 1), date(2024, 3, 31)).iloc[-1] == 300.0
+
+    def test_monthly_closes_do_not_collide_with_daily_caches(self, tmp_path: Path) -> None:
+        # "VOO.monthly" の日次キャッシュと VOO の月次集計が同じファイルにならないこと
+        source = CachedSource(FakeSource(_make_df("2024-01-01", 60)), data_dir=tmp_path)
+        source.fetch("VOO", date(2024, 1, 1), date(2024, 3, 31))
+        source.fetch("VOO.monthly", date(2024, 1, 1), date(2024, 3, 31))
+
+        monthly = source.load_monthly_closes("VOO", date(2024, 1, 1), date(2024, 3, 31))
+        daily = source.load_cache("VOO.monthly", date(2024, 1, 1), date(2024, 3, 31))
+
+        assert monthly is not None and len(monthly) == 3
+        assert daily is not None and len(daily.df) == 60
+
+    def test_monthly_closes_without_cache(self, tmp_path: Path) -> None:
+        source = CachedSource(FailingSource(), data_dir=tmp_path)
+        assert source.load_monthly_closes("TEST", date(2024, 1, 1), date(2024, 3, 31)) is None
+
     def test_merge_deduplicates(self, tmp_path: Path) -> None:
         df = _make_df("2024-01-01", 10)
         fake = FakeSource(df)
@@ -111,6 +309,32 @@ class TestCachedSource:
 
         assert len(result.df) == len(result.df.drop_duplicates(subset=["date"]))
 
+    def test_up_to_date_fetch_marks_cache_checked(self, tmp_path: Path) -> None:
+        fake = FakeSource(_make_df("2024-01-01", 23))
+        source = CachedSource(fake, data_dir=tmp_path)
+        source.fetch("TEST", date(2024, 1, 1), date(2024, 1, 31))
+        stale = (datetime.now() - timedelta(hours=4)).timestamp()
+        os.utime(tmp_path / "TEST.parquet", (stale, stale))
+
+        result = source.fetch("TEST", date(2024, 1, 1), date(2024, 1, 31))
+
+        assert fake.call_count == 1
+        mtime = (tmp_path / "TEST.parquet").stat().st_mtime
+        assert result.last_modified is not None
+        assert abs(result.last_modified.timestamp() - mtime) < 1e-3
+        assert mtime > stale + 3600
+
+    def test_merge_backfills_older_dates_in_order(self, tmp_path: Path) -> None:
+        df = _make_df("2024-01-01", 20)
+        source = CachedSource(FakeSource(df), data_dir=tmp_path)
+        source.fetch("TEST", date(2024, 1, 15), date(2024, 1, 31))
+        stale = (datetime.now() - timedelta(hours=4)).timestamp()
+        os.utime(tmp_path / "TEST.parquet", (stale, stale))
+
+        result = source.fetch("TEST", date(2024, 1, 1), date(2024, 1, 31))
+
+        assert result.df["date"].tolist() == df["date"].tolist()
+
     def test_last_date_property(self, tmp_path: Path) -> None:
         df = _make_df("2024-01-01", 5)
         fake = FakeSource(df)
@@ -143,6 +367,27 @@ class TestPriceHistory:
         assert len(ph) == 5
         assert ph.latest_close == 104.0
 
+    def test_array_views_follow_sorted_df(self) -> None:
+        df = _make_df("2024-01-01", 5).iloc[::-1]
+        ph = PriceHistory(df)
+        assert ph.closes.dtype == np.float64
+        assert ph.closes.tolist() == ph.df["close"].tolist()
+        assert (ph.dates == ph.df["date"].to_numpy()).all()
+        assert ph.iso_dates[0] == "2024-01-01"
+
+    def test_sorted_input_resets_index(self) -> None:
+        df = _make_df("2024-01-01", 5).iloc[2:]
+        ph = PriceHistory(df)
+        assert ph.df.index.tolist() == [0, 1, 2]
+        assert ph.df["close"].tolist() == [102.0, 103.0, 104.0]
+
+    def test_content_hash_tracks_data(self) -> None:
+        df = _make_df("2024-01-01", 5)
+        changed = df.copy()
+        changed.loc[2, "close"] = 0.0
+        assert PriceHistory(df).content_hash == PriceHistory(df.iloc[::-1]).content_hash
+        assert PriceHistory(df).content_hash != PriceHistory(changed).content_hash
+
     def test_missing_columns_raises(self) -> None:
         df = pd.DataFrame({"x": [1, 2], "y": [3, 4]})
         with pytest.raises(ValueError, match="Missing columns"):
@@ -154,8 +399,46 @@ class TestPriceHistory:
             PriceHistory(df)
 
 
+class TestWatchlistItem:
+    def test_is_frozen_and_hashable(self) -> None:
+        item = WatchlistItem(code="VOO", name="Vanguard", category=AssetCategory.US_STOCK)
+        with pytest.raises(ValidationError):
+            item.name = "changed"
+        assert len({item, item.model_copy()}) == 1
+
+
 class TestSourceFactory:
-    def test_get_source_returns_cached(self) -> None:
-        for category in AssetCategory:
-            source = get_source(category)
-            assert isinstance(source, CachedSource)
+    @pytest.mark.parametrize("category", list(AssetCategory), ids=lambda c: c.name)
+    def test_get_source_returns_cached(self, category: AssetCategory) -> None:
+        assert isinstance(get_source(category), CachedSource)
+
+
+class TestYahooJPSource:
+    def test_parse_bff_response(self) -> None:
+        body = {
+            "histories": [
+                {"date": "2024年1月5日", "price": "12,345"},
+                {"date": "2024年1月4日", "close": 12000.5},
+                {"date": "不明", "price": "1"},
+                {"date": "2024年1月3日"},
+                {"date": "2024年1月2日", "price": "-"},
+            ]
+        }
+        rows = YahooJPSource()._parse_bff_response(body)
+        assert rows == [(date(2024, 1, 5), 12345.0), (date(2024, 1, 4), 12000.5)]
+
+    def test_extract_table(self) -> None:
+        page = FakeTablePage([
+            [" 2024年1月5日 ", "12,345", "+10"],
+            ["2024年1月4日", "-"],
+            ["合計"],
+            ["2024年1月3日", "12,000"],
+        ])
+        rows = YahooJPSource()._extract_table(page)
+        assert rows == [(date(2024, 1, 5), 12345.0), (date(2024, 1, 3), 12000.0)]
+
+    def test_latest_json_skips_unparsable_responses(self) -> None:
+        responses = [FakeResponse({"page": 1}), FakeResponse({"page": 2}), FakeResponse(None)]
+        assert _latest_json(responses) == {"page": 2}
+        assert _latest_json([FakeResponse(None)]) is None
+        assert _latest_json([]) is None